@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_environment(django_test_environment):
+    """Кэш и метрики тестов — во временном каталоге, как в manage.py test."""
+    from core.test_runner import isolated_environment
+    with isolated_environment():
+        yield
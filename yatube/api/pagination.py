@@ -0,0 +1,72 @@
+"""
+Keyset-пагинация API по строкам ``values()``.
+
+Страница — срез индекса за ключом курсора (?after=), без OFFSET
+и COUNT(*). Курсор того же формата, что у CursorPaginator. Несколько
+непересекающихся источников (готовая лента подписок и авторы, которые
+читаются при запросе) сливаются по ключу, как в MergedCursorPaginator.
+"""
+import heapq
+from itertools import islice
+from operator import itemgetter
+
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+
+from posts.paginators import pack_cursor, unpack_cursor
+
+# Псевдонимы ключа сортировки в строках values().
+KEY = 'cursor_key'
+PK = 'cursor_pk'
+
+
+def encode_cursor(row, number):
+    key = row[KEY]
+    if hasattr(key, 'isoformat'):
+        key = key.isoformat()
+    return pack_cursor(key, row[PK], number)
+
+
+def _rows(queryset, lookups, fields, bound, limit, ascending):
+    key_lookup, pk_lookup = lookups
+    if bound is not None:
+        key, pk = bound
+        op = 'gt' if ascending else 'lt'
+        queryset = queryset.filter(
+            Q(**{f'{key_lookup}__{op}': key})
+            | Q(**{key_lookup: key, f'{pk_lookup}__{op}': pk}),
+            **{f'{key_lookup}__{op}e': key},
+        )
+    desc = '' if ascending else '-'
+    queryset = queryset.order_by(f'{desc}{key_lookup}', f'{desc}{pk_lookup}')
+    return list(queryset.values(
+        *fields, **{KEY: F(key_lookup), PK: F(pk_lookup)})[:limit])
+
+
+def keyset_page(sources, fields, limit, after=None,
+                parse_key=parse_datetime, ascending=False):
+    """
+    Строки страницы за курсором ``after`` и курсор следующей страницы
+    (None, если страница последняя).
+
+    ``sources`` — пары (queryset, (поле ключа, поле id)); каждый
+    источник читает не больше ``limit + 1`` строк.
+    """
+    bound = None
+    number = 1
+    if after:
+        key, pk, number = unpack_cursor(after, parse_key)
+        bound = (key, pk)
+        number += 1
+    merged = heapq.merge(
+        *(_rows(queryset, lookups, fields, bound, limit + 1, ascending)
+          for queryset, lookups in sources),
+        key=itemgetter(KEY, PK), reverse=not ascending)
+    rows = list(islice(merged, limit + 1))
+    cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        cursor = encode_cursor(rows[-1], number)
+    for row in rows:
+        del row[KEY], row[PK]
+    return rows, cursor
@@ -0,0 +1,137 @@
+"""
+Ресурсы API: какие поля можно запросить через ?fields= и откуда они
+берутся.
+
+Простые поля читаются из строк ``values()`` основного запроса. Автор,
+группа и счётчики загружаются пачкой на всю страницу — по одному
+запросу на поле, сколько бы строк ни было на странице.
+"""
+from django.core.files.storage import default_storage
+from django.db.models import Count
+
+from posts.models import Comment, Group, Post, User
+
+
+class InvalidQuery(ValueError):
+    pass
+
+
+class Field:
+    """
+    Поле ресурса. ``lookup`` читается через values(); ``load`` получает
+    множество значений lookup со всей страницы и возвращает словарь
+    значение -> поле, ``convert`` преобразует значение одной строки.
+    """
+
+    def __init__(self, lookup, load=None, convert=None, default=None):
+        self.lookup = lookup
+        self.load = load
+        self.convert = convert
+        self.default = default
+
+    def value(self, row, loaded):
+        value = row[self.lookup]
+        if self.load:
+            return loaded.get(value, self.default)
+        if self.convert:
+            return self.convert(value)
+        return value
+
+
+class Resource:
+    def __init__(self, fields, default):
+        self.fields = fields
+        self.default = default
+
+    def select(self, param):
+        """Имена полей из ?fields=; без параметра — поля по умолчанию."""
+        names = [name.strip() for name in (param or '').split(',')
+                 if name.strip()]
+        if not names:
+            return list(self.default)
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise InvalidQuery('Неизвестные поля: ' + ', '.join(unknown))
+        return list(dict.fromkeys(names))
+
+    def lookups(self, names):
+        return list(dict.fromkeys(self.fields[name].lookup
+                                  for name in names))
+
+    def serialize(self, rows, names):
+        fields = {name: self.fields[name] for name in names}
+        loaded = {}
+        for name, field in fields.items():
+            if field.load:
+                values = {row[field.lookup] for row in rows} - {None}
+                loaded[name] = field.load(values) if values else {}
+        return [
+            {name: field.value(row, loaded.get(name))
+             for name, field in fields.items()}
+            for row in rows
+        ]
+
+
+def load_users(ids):
+    users = User.objects.filter(pk__in=ids).values(
+        'pk', 'username', 'first_name', 'last_name')
+    return {user.pop('pk'): user for user in users}
+
+
+def load_groups(ids):
+    groups = Group.objects.filter(pk__in=ids).values('pk', 'slug', 'title')
+    return {group.pop('pk'): group for group in groups}
+
+
+def count_by(model, field):
+    """Загрузчик числа записей ``model`` на каждое значение ``field``."""
+    def load(values):
+        return dict(model.objects.filter(**{f'{field}__in': values})
+                    .order_by().values_list(field)
+                    .annotate(total=Count('pk')))
+    return load
+
+
+def media_url(name):
+    return default_storage.url(name) if name else None
+
+
+POSTS = Resource({
+    'id': Field('pk'),
+    'text': Field('text'),
+    'pub_date': Field('pub_date'),
+    'updated': Field('updated'),
+    'author': Field('author_id', load=load_users),
+    'group': Field('group_id', load=load_groups),
+    'image': Field('image', convert=media_url),
+    'comments_count': Field(
+        'pk', load=count_by(Comment, 'post_id'), default=0),
+}, default=('id', 'text', 'pub_date', 'author', 'group', 'image'))
+
+COMMENTS = Resource({
+    'id': Field('pk'),
+    'text': Field('text'),
+    'created': Field('created'),
+    'author': Field('author_id', load=load_users),
+    'post': Field('post_id'),
+}, default=('id', 'text', 'created', 'author'))
+
+GROUPS = Resource({
+    'id': Field('pk'),
+    'slug': Field('slug'),
+    'title': Field('title'),
+    'description': Field('description'),
+    'posts_count': Field('pk', load=count_by(Post, 'group_id'), default=0),
+}, default=('id', 'slug', 'title', 'description'))
+
+# Счётчики — из UserStats, как на странице профиля.
+PROFILES = Resource({
+    'id': Field('pk'),
+    'username': Field('username'),
+    'first_name': Field('first_name'),
+    'last_name': Field('last_name'),
+    'posts_count': Field('stats__posts_count'),
+    'follower_count': Field('stats__follower_count'),
+    'following_count': Field('stats__following_count'),
+}, default=('id', 'username', 'first_name', 'last_name', 'posts_count',
+            'follower_count', 'following_count'))
@@ -0,0 +1,192 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post, PulledAuthor
+from posts.paginators import pack_cursor
+
+User = get_user_model()
+
+
+def create_posts(author, count, group=None):
+    posts = Post.objects.bulk_create(
+        Post(author=author, group=group, text=f'Пост {index}')
+        for index in range(count))
+    # У bulk_create одинаковые pub_date: разводим, чтобы порядок был явным.
+    now = timezone.now()
+    for index, post in enumerate(Post.objects.filter(author=author)):
+        Post.objects.filter(pk=post.pk).update(
+            pub_date=now - timedelta(minutes=index))
+    return posts
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Первый пост')
+        Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий')
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+
+    def get(self, name, client=None, data=None, **kwargs):
+        return (client or self.guest_client).get(
+            reverse(f'api:{name}', kwargs=kwargs), data)
+
+    def test_post_list_default_fields(self):
+        """Пост сериализуется с автором и группой вложенными объектами."""
+        response = self.get('posts')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        data = response.json()
+        self.assertIsNone(data['next'])
+        self.assertEqual(data['results'], [{
+            'id': self.post.pk,
+            'text': 'Первый пост',
+            'pub_date': data['results'][0]['pub_date'],
+            'author': {'username': 'author', 'first_name': 'Лев',
+                       'last_name': 'Толстой'},
+            'group': {'slug': 'group', 'title': 'Группа'},
+            'image': None,
+        }])
+
+    def test_sparse_fields(self):
+        """?fields= оставляет только запрошенные поля."""
+        data = self.get(
+            'post', data={'fields': 'id,comments_count'},
+            post_id=self.post.pk).json()
+        self.assertEqual(data, {'id': self.post.pk, 'comments_count': 1})
+
+    def test_unknown_field_is_bad_request(self):
+        response = self.get('posts', data={'fields': 'id,password'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('password', response.json()['detail'])
+
+    def test_invalid_limit_and_cursor_are_bad_requests(self):
+        for data in ({'limit': 'many'}, {'limit': 0}, {'limit': 1000},
+                     {'after': 'garbage'},
+                     {'after': pack_cursor(
+                         '2020-01-01T00:00:00+00:00', 2 ** 63, 1)}):
+            with self.subTest(data=data):
+                response = self.get('posts', data=data)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.BAD_REQUEST)
+
+    def test_missing_objects_are_not_found(self):
+        for name, kwargs in (
+            ('post', {'post_id': 0}),
+            ('comments', {'post_id': 0}),
+            ('group', {'slug': 'missing'}),
+            ('group_posts', {'slug': 'missing'}),
+            ('profile', {'username': 'missing'}),
+            ('profile_posts', {'username': 'missing'}),
+        ):
+            with self.subTest(name=name):
+                response = self.get(name, **kwargs)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertEqual(response.json(), {'detail': 'Не найдено.'})
+
+    def test_read_only(self):
+        response = self.guest_client.post(reverse('api:posts'))
+        self.assertEqual(response.status_code,
+                         HTTPStatus.METHOD_NOT_ALLOWED)
+
+    def test_keyset_pages_cover_feed_once(self):
+        """Страницы по курсору next отдают все посты по разу, по порядку."""
+        create_posts(self.reader, 7)
+        expected = list(Post.objects.order_by(
+            '-pub_date', '-pk').values_list('pk', flat=True))
+        seen = []
+        url = reverse('api:posts') + '?limit=3&fields=id'
+        while url:
+            data = self.guest_client.get(url).json()
+            self.assertLessEqual(len(data['results']), 3)
+            seen += [post['id'] for post in data['results']]
+            url = data['next']
+        self.assertEqual(seen, expected)
+
+    def test_post_list_query_count_does_not_grow(self):
+        """Автор, группа и счётчик грузятся пачкой: нет N+1."""
+        url = reverse('api:posts')
+        data = {'fields': 'id,author,group,comments_count'}
+        with CaptureQueriesContext(connection) as one_post:
+            self.guest_client.get(url, data)
+        for index in range(5):
+            user = User.objects.create_user(username=f'user{index}')
+            group = Group.objects.create(slug=f'group{index}', title='Г')
+            create_posts(user, 2, group)
+        with CaptureQueriesContext(connection) as many_posts:
+            response = self.guest_client.get(url, data)
+        self.assertEqual(len(response.json()['results']), 11)
+        self.assertEqual(len(many_posts), len(one_post))
+
+    def test_group_and_profile_posts(self):
+        create_posts(self.reader, 2)
+        group_posts = self.get('group_posts', slug=self.group.slug).json()
+        self.assertEqual(
+            [post['id'] for post in group_posts['results']], [self.post.pk])
+        profile_posts = self.get(
+            'profile_posts', username=self.reader.username).json()
+        self.assertEqual(len(profile_posts['results']), 2)
+
+    def test_comments_oldest_first(self):
+        comment = Comment.objects.create(
+            post=self.post, author=self.author, text='Ответ')
+        data = self.get('comments', post_id=self.post.pk).json()
+        self.assertEqual([item['text'] for item in data['results']],
+                         ['Комментарий', comment.text])
+        self.assertEqual(data['results'][0]['author']['username'], 'reader')
+
+    def test_groups(self):
+        Group.objects.create(title='Ещё', slug='another', description='')
+        data = self.get('groups', data={'fields': 'slug,posts_count'}).json()
+        self.assertEqual(data['results'], [
+            {'slug': 'another', 'posts_count': 0},
+            {'slug': 'group', 'posts_count': 1},
+        ])
+        data = self.get('group', slug='group').json()
+        self.assertEqual(data['description'], 'Описание')
+
+    def test_profile_counters(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        data = self.get('profile', username=self.author.username).json()
+        self.assertEqual(data['posts_count'], 1)
+        self.assertEqual(data['following_count'], 1)
+        self.assertEqual(data['follower_count'], 0)
+
+    def test_follow_feed_requires_login(self):
+        response = self.get('follow_posts')
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_follow_feed_merges_pulled_authors(self):
+        """В ленте подписок и готовая лента, и авторы без раскладки."""
+        pulled = User.objects.create_user(username='pulled')
+        PulledAuthor.objects.create(author=pulled)
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=pulled)
+        create_posts(pulled, 3)
+        expected = list(Post.objects.order_by(
+            '-pub_date', '-pk').values_list('pk', flat=True))
+        seen = []
+        url = reverse('api:follow_posts') + '?limit=2&fields=id'
+        while url:
+            data = self.authorized_client.get(url).json()
+            seen += [post['id'] for post in data['results']]
+            url = data['next']
+        self.assertEqual(seen, expected)
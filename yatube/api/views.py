@@ -0,0 +1,161 @@
+"""
+JSON API только для чтения: посты, группы, комментарии и профили.
+
+Ответы собираются из строк ``values()``, без создания моделей. Списки —
+keyset-страницы вида ``{"results": [...], "next": url}``; набор полей
+задаётся параметром ``?fields=a,b``, размер страницы — ``?limit=``.
+"""
+from functools import wraps
+from http import HTTPStatus
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from posts import counters, timelines
+from posts.models import Comment, Group, Post, User, UserStats
+from posts.paginators import InvalidCursor
+
+from . import resources
+from .pagination import keyset_page
+from .resources import InvalidQuery
+
+COMMENT_LOOKUPS = ('created', 'pk')
+GROUP_LOOKUPS = ('slug', 'pk')
+
+
+def json_response(data, status=HTTPStatus.OK):
+    return JsonResponse(data, status=status,
+                        json_dumps_params={'ensure_ascii': False})
+
+
+def error_response(detail, status):
+    return json_response({'detail': detail}, status=status)
+
+
+def api_view(view):
+    """GET/HEAD и ошибки запроса в виде JSON вместо HTML-страниц."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return error_response('Не найдено.', HTTPStatus.NOT_FOUND)
+        except InvalidCursor:
+            return error_response('Неверный курсор.', HTTPStatus.BAD_REQUEST)
+        except InvalidQuery as error:
+            return error_response(str(error), HTTPStatus.BAD_REQUEST)
+    return require_safe(wrapper)
+
+
+def page_size(request):
+    limit = request.GET.get('limit')
+    if limit is None:
+        return settings.API_PAGE_SIZE
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise InvalidQuery('limit должен быть целым числом.')
+    if not 1 <= limit <= settings.API_MAX_PAGE_SIZE:
+        raise InvalidQuery(
+            f'limit должен быть от 1 до {settings.API_MAX_PAGE_SIZE}.')
+    return limit
+
+
+def list_response(request, resource, sources, **kwargs):
+    names = resource.select(request.GET.get('fields'))
+    rows, cursor = keyset_page(
+        sources, resource.lookups(names), page_size(request),
+        after=request.GET.get('after'), **kwargs)
+    next_url = None
+    if cursor:
+        query = request.GET.copy()
+        query['after'] = cursor
+        next_url = f'{request.path}?{query.urlencode()}'
+    return json_response({
+        'results': resource.serialize(rows, names),
+        'next': next_url,
+    })
+
+
+def detail_response(request, resource, queryset):
+    names = resource.select(request.GET.get('fields'))
+    row = queryset.values(*resource.lookups(names)).first()
+    if row is None:
+        raise Http404
+    return json_response(resource.serialize([row], names)[0])
+
+
+def pk_or_404(queryset):
+    pk = queryset.values_list('pk', flat=True).first()
+    if pk is None:
+        raise Http404
+    return pk
+
+
+def post_list(request, queryset):
+    return list_response(request, resources.POSTS,
+                         [(queryset, timelines.POST_LOOKUPS)])
+
+
+@api_view
+def posts(request):
+    return post_list(request, Post.objects.all())
+
+
+@api_view
+def post(request, post_id):
+    return detail_response(request, resources.POSTS,
+                           Post.objects.filter(pk=post_id))
+
+
+@api_view
+def comments(request, post_id):
+    post_id = pk_or_404(Post.objects.filter(pk=post_id))
+    return list_response(
+        request, resources.COMMENTS,
+        [(Comment.objects.filter(post_id=post_id), COMMENT_LOOKUPS)],
+        ascending=True)
+
+
+@api_view
+def groups(request):
+    return list_response(
+        request, resources.GROUPS, [(Group.objects.all(), GROUP_LOOKUPS)],
+        parse_key=str, ascending=True)
+
+
+@api_view
+def group(request, slug):
+    return detail_response(request, resources.GROUPS,
+                           Group.objects.filter(slug=slug))
+
+
+@api_view
+def group_posts(request, slug):
+    group_id = pk_or_404(Group.objects.filter(slug=slug))
+    return post_list(request, Post.objects.filter(group_id=group_id))
+
+
+@api_view
+def profile(request, username):
+    users = User.objects.filter(username=username)
+    if not UserStats.objects.filter(user__in=users).exists():
+        # Строка счётчиков создаётся при первом чтении, как в профиле.
+        counters.get_stats(get_object_or_404(users))
+    return detail_response(request, resources.PROFILES, users)
+
+
+@api_view
+def profile_posts(request, username):
+    author_id = pk_or_404(User.objects.filter(username=username))
+    return post_list(request, Post.objects.filter(author_id=author_id))
+
+
+@api_view
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return error_response('Требуется вход.', HTTPStatus.UNAUTHORIZED)
+    return list_response(request, resources.POSTS,
+                         timelines.follow_sources(request.user))
@@ -0,0 +1,288 @@
+"""
+Кэш в файле SQLite, общий для всех процессов на машине.
+
+LocMemCache держит отдельную копию в каждом воркере, и сброс версии
+в одном процессе не виден остальным. Здесь все воркеры открывают один
+файл в режиме WAL: читатели не блокируют писателя, запись атомарна.
+
+- вытеснение LRU: при превышении MAX_ENTRIES удаляются записи, к которым
+  дольше всего не обращались (после просроченных); размер проверяется
+  не на каждой записи, а раз на ``CULL_CHECK_SHARE`` от MAX_ENTRIES;
+- целые числа в диапазоне 64 бит хранятся как INTEGER, и ``incr`` —
+  один UPDATE без чтения и перезаписи значения, так что версии ключей
+  не теряют инкременты при гонке процессов;
+- ``get_many``/``set_many``/``delete_many`` — один запрос или одна
+  транзакция на весь набор ключей.
+
+Пример настройки::
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY,'
+    ' value BLOB NOT NULL,'
+    ' expires REAL,'
+    ' accessed REAL NOT NULL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed)',
+)
+ALIVE = '(expires IS NULL OR expires > ?)'
+ACCESS_RESOLUTION = 1
+# Диапазон INTEGER в SQLite; целые за ним хранятся через pickle.
+INT_MIN, INT_MAX = -2 ** 63, 2 ** 63 - 1
+# Доля MAX_ENTRIES, после записи которой проверяется размер таблицы.
+CULL_CHECK_SHARE = 0.01
+# Ограничение SQLite на число параметров в запросе (до 3.32 — 999).
+CHUNK_SIZE = 500
+
+
+def _chunks(items):
+    items = list(items)
+    for start in range(0, len(items), CHUNK_SIZE):
+        yield items[start:start + CHUNK_SIZE]
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        # count(*) читает весь индекс: размер проверяем раз на столько
+        # записей, так что таблица превышает MAX_ENTRIES не больше
+        # чем на CULL_CHECK_SHARE в каждом процессе.
+        self._cull_interval = max(1, int(self._max_entries * CULL_CHECK_SHARE))
+        self._writes_since_cull = 0
+
+    def _connection(self):
+        # Соединение своё у каждого потока и у каждого процесса после fork.
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+        return local.connection
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self._path, timeout=30, isolation_level=None,
+            check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    @contextmanager
+    def _write(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dump(value):
+        if type(value) is int and INT_MIN <= value <= INT_MAX:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _load(value):
+        if isinstance(value, bytes):
+            return pickle.loads(value)
+        return value
+
+    def _read(self, keys):
+        """
+        Живые значения по ключам. Отметка обращения для LRU обновляется
+        не чаще раза в ACCESS_RESOLUTION секунд, так что частые чтения
+        обходятся без записи.
+        """
+        connection = self._connection()
+        now = time.time()
+        found = {}
+        stale = []
+        for chunk in _chunks(keys):
+            marks = ','.join('?' * len(chunk))
+            rows = connection.execute(
+                f'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({marks}) AND {ALIVE}', [*chunk, now])
+            for key, value, accessed in rows:
+                found[key] = self._load(value)
+                if accessed < now - ACCESS_RESOLUTION:
+                    stale.append(key)
+        for chunk in _chunks(stale):
+            marks = ','.join('?' * len(chunk))
+            connection.execute(
+                f'UPDATE cache SET accessed = ? WHERE key IN ({marks})',
+                [now, *chunk])
+        metrics.count_cache(keys, found)
+        return found
+
+    def _store(self, connection, rows, mode='REPLACE'):
+        now = time.time()
+        cursor = connection.executemany(
+            f'INSERT OR {mode} INTO cache (key, value, expires, accessed) '
+            f'VALUES (?, ?, ?, ?)',
+            [(key, self._dump(value), expires, now)
+             for key, value, expires in rows])
+        self._writes_since_cull += len(rows)
+        if self._writes_since_cull >= self._cull_interval:
+            self._writes_since_cull = 0
+            self._cull(connection, now)
+        return cursor.rowcount
+
+    def _cull(self, connection, now):
+        total, = connection.execute('SELECT count(*) FROM cache').fetchone()
+        if total <= self._max_entries:
+            return
+        connection.execute(
+            'DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?',
+            [now])
+        total, = connection.execute('SELECT count(*) FROM cache').fetchone()
+        excess = total - self._max_entries
+        if excess > 0:
+            # Удаляем с запасом, как cull_frequency у встроенных бэкендов,
+            # чтобы не вытеснять по одной записи на каждый set().
+            if self._cull_frequency:
+                excess += self._max_entries // self._cull_frequency
+            else:
+                excess = total
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                [excess])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._write() as connection:
+            connection.execute(
+                f'DELETE FROM cache WHERE key = ? AND NOT {ALIVE}',
+                [key, time.time()])
+            expires = self.get_backend_timeout(timeout)
+            added = self._store(
+                connection, [(key, value, expires)], mode='IGNORE')
+        return added == 1
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        if not keys:
+            return {}
+        return {keys[key]: value
+                for key, value in self._read(list(keys)).items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        with self._write() as connection:
+            self._store(connection, [(key, value, expires)])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self._key(key, version), value, expires)
+                for key, value in data.items()]
+        if rows:
+            with self._write() as connection:
+                self._store(connection, rows)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        with self._write() as connection:
+            cursor = connection.execute(
+                f'UPDATE cache SET expires = ?, accessed = ? '
+                f'WHERE key = ? AND {ALIVE}',
+                [expires, now, key, now])
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._write() as connection:
+            rowcount = 0
+            if INT_MIN <= delta <= INT_MAX:
+                # При переполнении SQLite молча сделал бы значение REAL:
+                # такие случаи уходят в чтение и перезапись ниже.
+                cursor = connection.execute(
+                    f"UPDATE cache SET value = value + ?, accessed = ? "
+                    f"WHERE key = ? AND typeof(value) = 'integer' "
+                    f"AND value BETWEEN ? AND ? AND {ALIVE}",
+                    [delta, now, key, max(INT_MIN, INT_MIN - delta),
+                     min(INT_MAX, INT_MAX - delta), now])
+                rowcount = cursor.rowcount
+            if rowcount:
+                value, = connection.execute(
+                    'SELECT value FROM cache WHERE key = ?',
+                    [key]).fetchone()
+                return value
+            row = connection.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {ALIVE}',
+                [key, now]).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            # Не целое или выходит за INTEGER: читаем и пишем в той же
+            # транзакции, большое целое сохранится через pickle.
+            value = self._load(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                [self._dump(value), now, key])
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            [key, time.time()]).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        keys = [self._key(key, version) for key in keys]
+        with self._write() as connection:
+            for chunk in _chunks(keys):
+                marks = ','.join('?' * len(chunk))
+                connection.execute(
+                    f'DELETE FROM cache WHERE key IN ({marks})', chunk)
+
+    def clear(self):
+        with self._write() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def close(self, **kwargs):
+        # Соединение держим открытым между запросами: открытие файла
+        # и PRAGMA на каждый запрос стоили бы дороже самого кэша.
+        pass
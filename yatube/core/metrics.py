@@ -0,0 +1,176 @@
+"""
+Замеры запросов: число SQL-запросов и их время, попадания и промахи
+кэша, время рендеринга шаблонов.
+
+Замер живёт в потоке запроса (``sampling``), пока его ведёт
+RequestMetricsMiddleware. Вне замера хуки в кэше и шаблонах сводятся
+к одной проверке thread-local, обёртки запросов к базе не ставятся
+вовсе. Итоги копятся по имени URL в рядах core.prometheus, общих для
+всех процессов (``record``), и читаются ``snapshot``.
+"""
+import re
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+from django.template.base import Template
+
+from . import prometheus
+
+FIELDS = ('requests', 'duration', 'queries', 'sql_time', 'cache_hits',
+          'cache_misses', 'template_time')
+# Ключи тега {% cache %}: template.cache.<имя фрагмента>.<хэш>
+FRAGMENT_KEY = re.compile(r'template\.cache\.([\w-]+)\.')
+
+REQUEST_DURATION = prometheus.Histogram(
+    'yatube_http_request_duration_seconds', 'Время ответа view.',
+    ['view', 'method'])
+REQUESTS = prometheus.Counter(
+    'yatube_http_requests_total', 'Ответы по view и коду.',
+    ['view', 'method', 'status'])
+RESPONSE_SIZE = prometheus.Histogram(
+    'yatube_http_response_size_bytes', 'Размер тела ответа.', ['view'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576))
+WORKER = prometheus.Gauge(
+    'yatube_worker_info', 'Живые процессы, отдающие запросы.',
+    ['pid', 'ppid', 'hostname'])
+SAMPLED = prometheus.Counter(
+    'yatube_sampled_requests_total',
+    'Запросы с замером SQL, кэша и шаблонов.', ['view'])
+SAMPLED_DURATION = prometheus.Counter(
+    'yatube_sampled_request_seconds_total',
+    'Время ответа запросов с замером.', ['view'])
+DB_QUERIES = prometheus.Counter(
+    'yatube_db_queries_total', 'SQL-запросы в запросах с замером.',
+    ['view'])
+DB_TIME = prometheus.Counter(
+    'yatube_db_query_seconds_total',
+    'Время SQL-запросов в запросах с замером.', ['view'])
+CACHE = prometheus.Counter(
+    'yatube_cache_requests_total',
+    'Чтения ключей кэша в запросах с замером.', ['view', 'result'])
+TEMPLATE_TIME = prometheus.Counter(
+    'yatube_template_render_seconds_total',
+    'Рендеринг шаблонов в запросах с замером.', ['view'])
+FRAGMENT_CACHE = prometheus.Counter(
+    'yatube_fragment_cache_requests_total',
+    'Чтения кэшированных фрагментов страниц.', ['fragment', 'result'])
+
+# Ряд -> поле snapshot; у CACHE поле зависит от метки result.
+SNAPSHOT_FIELDS = {
+    (SAMPLED.name, None): 'requests',
+    (SAMPLED_DURATION.name, None): 'duration',
+    (DB_QUERIES.name, None): 'queries',
+    (DB_TIME.name, None): 'sql_time',
+    (CACHE.name, 'hit'): 'cache_hits',
+    (CACHE.name, 'miss'): 'cache_misses',
+    (TEMPLATE_TIME.name, None): 'template_time',
+}
+
+_local = threading.local()
+
+
+class Sample:
+    __slots__ = ('queries', 'sql_time', 'cache_hits', 'cache_misses',
+                 'template_time', 'template_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+
+
+def current():
+    return getattr(_local, 'sample', None)
+
+
+@contextmanager
+def sampling():
+    """Замер на время блока: запросы ко всем базам, кэш и шаблоны."""
+    sample = Sample()
+    _local.sample = sample
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(sample.execute))
+            yield sample
+    finally:
+        _local.sample = None
+
+
+def count_cache(keys, found):
+    """Чтение ключей ``keys`` из кэша, из них нашлись ``found``."""
+    sample = current()
+    if sample is not None:
+        sample.cache_hits += len(found)
+        sample.cache_misses += len(keys) - len(found)
+    for key in keys:
+        match = FRAGMENT_KEY.search(key)
+        if match:
+            count_fragment(match.group(1), key in found)
+
+
+def count_fragment(fragment, hit):
+    FRAGMENT_CACHE.inc(fragment=fragment, result='hit' if hit else 'miss')
+
+
+def _timed_render(render):
+    def timed(self, context):
+        sample = current()
+        # Вложенные шаблоны ({% include %}) уже входят во время внешнего.
+        if sample is None or sample.template_depth:
+            return render(self, context)
+        sample.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            sample.template_time += time.perf_counter() - start
+            sample.template_depth -= 1
+    timed.untimed = render
+    return timed
+
+
+def install_template_timer():
+    if not hasattr(Template.render, 'untimed'):
+        Template.render = _timed_render(Template.render)
+
+
+def record(name, sample, duration):
+    """Добавляет замер к итогам URL ``name``."""
+    SAMPLED.inc(view=name)
+    SAMPLED_DURATION.inc(duration, view=name)
+    DB_QUERIES.inc(sample.queries, view=name)
+    DB_TIME.inc(sample.sql_time, view=name)
+    CACHE.inc(sample.cache_hits, view=name, result='hit')
+    CACHE.inc(sample.cache_misses, view=name, result='miss')
+    TEMPLATE_TIME.inc(sample.template_time, view=name)
+
+
+def snapshot():
+    """Итоги замеров всех процессов: ``{имя URL: {поле: сумма}}``."""
+    totals = {}
+    for (series, labels), value in prometheus.collect().items():
+        labels = dict(labels)
+        field = SNAPSHOT_FIELDS.get((series, labels.get('result')))
+        if field:
+            totals.setdefault(
+                labels['view'], dict.fromkeys(FIELDS, 0))[field] = value
+    return totals
+
+
+def reset():
+    prometheus.clear()
@@ -0,0 +1,83 @@
+import os
+import random
+import socket
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from . import metrics
+
+# Остальные методы — одна метка: иначе клиент плодил бы ряды без предела.
+HTTP_METHODS = frozenset((
+    'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE',
+    'CONNECT'))
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеры запроса по имени URL (``posts:index``): SQL-запросы и их
+    время, кэш, шаблоны.
+
+    При ``METRICS_EXPORT`` время, код и размер каждого ответа идут
+    в ряды Prometheus (/metrics). В итоги замеров попадает доля
+    ``REQUEST_METRICS_SAMPLE_RATE`` запросов; персонал при
+    ``REQUEST_METRICS_STAFF`` видит замер каждого своего запроса
+    в заголовке Server-Timing. Если выключено всё, middleware
+    не подключается.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.export = settings.METRICS_EXPORT
+        self.sample_rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        self.staff = settings.REQUEST_METRICS_STAFF
+        if not self.export and not self.sample_rate and not self.staff:
+            raise MiddlewareNotUsed
+        metrics.install_template_timer()
+        self.pid = None
+
+    def __call__(self, request):
+        sampled = random.random() < self.sample_rate
+        staff = self.staff and request.user.is_staff
+        start = time.perf_counter()
+        if sampled or staff:
+            with metrics.sampling() as sample:
+                response = self.get_response(request)
+        else:
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        name = match.view_name if match else 'unresolved'
+        if self.export:
+            self.export_response(request, response, name, duration)
+        if sampled:
+            metrics.record(name, sample, duration)
+        if staff:
+            response['Server-Timing'] = server_timing(sample, duration)
+        return response
+
+    def export_response(self, request, response, name, duration):
+        if self.pid != os.getpid():
+            # Первый запрос воркера (после fork у gunicorn): он заявляет
+            # о себе, /metrics показывает только живые процессы.
+            self.pid = os.getpid()
+            metrics.WORKER.set(1, pid=self.pid, ppid=os.getppid(),
+                               hostname=socket.gethostname())
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        metrics.REQUEST_DURATION.observe(duration, view=name, method=method)
+        metrics.REQUESTS.inc(
+            view=name, method=method, status=response.status_code)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.observe(len(response.content), view=name)
+
+
+def server_timing(sample, duration):
+    return ', '.join((
+        f'db;dur={sample.sql_time * 1000:.1f};'
+        f'desc="{sample.queries} queries"',
+        f'cache;desc="{sample.cache_hits} hits, '
+        f'{sample.cache_misses} misses"',
+        f'tpl;dur={sample.template_time * 1000:.1f}',
+        f'total;dur={duration * 1000:.1f}',
+    ))
@@ -0,0 +1,27 @@
+"""
+Процессы пулов (ProcessPoolExecutor), запущенные через spawn.
+
+Пул создаётся лениво, из потока запроса, а fork многопоточного процесса
+унёс бы в потомка блокировки, захваченные другими потоками, — логирования,
+соединения с базой, кэша, — и потомок мог бы навсегда повиснуть на них.
+Процесс, запущенный через spawn, ничего не наследует и настраивает Django
+заново. Инициализатор распаковывается в нём до django.setup(), поэтому
+модуль не импортирует ничего, что требует загруженных приложений.
+"""
+import django
+from django.conf import settings
+
+# Настройки, которые родитель мог поменять после запуска (тесты,
+# benchmark_views): процесс пула берёт их у родителя, а не из модуля.
+INHERITED_SETTINGS = ('DATABASES', 'CACHES', 'MEDIA_ROOT', 'METRICS_DIR')
+
+
+def inherited_settings():
+    return {name: getattr(settings, name) for name in INHERITED_SETTINGS}
+
+
+def setup(overrides):
+    """Инициализатор процесса пула: Django с настройками родителя."""
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    django.setup()
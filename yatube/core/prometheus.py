@@ -0,0 +1,310 @@
+"""
+Метрики в текстовом формате Prometheus, общие для всех процессов.
+
+Каждый процесс (воркер gunicorn, процесс пула миниатюр) пишет свои
+значения в собственный файл ``METRICS_DIR/<вид>_<pid>.db``, отображённый
+в память через mmap: запись — struct.pack_into по известному смещению,
+без блокировок между процессами и без внешних сервисов. ``render``
+читает все файлы каталога и складывает одинаковые ряды. Счётчики
+и гистограммы умерших процессов остаются в сумме (ряды только
+растут), а датчики (gauge) берутся лишь у живых процессов.
+
+Каталог стоит очищать при запуске мастера (``clear`` в хуке
+``on_starting`` gunicorn); без этого счётчики просто продолжат расти.
+
+Формат файла: 8 байт заголовка (занятый объём, uint32), затем записи
+``[длина ключа uint32][ключ JSON, выровнен до 8][значение float64]``.
+Запись сначала пишется целиком, и только потом растёт заголовок,
+так что читатель никогда не видит недописанную запись.
+"""
+import glob
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+INITIAL_SIZE = 64 * 1024
+HEADER = struct.Struct('<I4x')
+LENGTH = struct.Struct('<I')
+VALUE = struct.Struct('<d')
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _padded(length):
+    return length + (-length) % 8
+
+
+def _entries(data):
+    """Пары (ключ, значение, смещение значения) из содержимого файла."""
+    if len(data) < HEADER.size:
+        return
+    used, = HEADER.unpack_from(data, 0)
+    offset = HEADER.size
+    while offset < used:
+        length, = LENGTH.unpack_from(data, offset)
+        start = offset + LENGTH.size
+        key = data[start:start + length].decode()
+        value_offset = start + _padded(length + LENGTH.size) - LENGTH.size
+        value, = VALUE.unpack_from(data, value_offset)
+        yield key, value, value_offset
+        offset = value_offset + VALUE.size
+
+
+class ValueFile:
+    """Файл значений одного процесса."""
+
+    def __init__(self, path):
+        self.path = path
+        exists = os.path.exists(path)
+        self._file = open(path, 'a+b')
+        if not exists or os.path.getsize(path) < HEADER.size:
+            self._file.truncate(INITIAL_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._used, = HEADER.unpack_from(self._map, 0)
+        if not self._used:
+            self._used = HEADER.size
+            HEADER.pack_into(self._map, 0, self._used)
+        # Файл с тем же pid мог остаться от прошлого запуска: продолжаем.
+        self._offsets = {key: offset
+                         for key, _, offset in _entries(self._map)}
+
+    def add(self, key, amount):
+        offset = self._offset(key)
+        value, = VALUE.unpack_from(self._map, offset)
+        VALUE.pack_into(self._map, offset, value + amount)
+
+    def set(self, key, value):
+        VALUE.pack_into(self._map, self._offset(key), value)
+
+    def _offset(self, key):
+        offset = self._offsets.get(key)
+        if offset is None:
+            offset = self._append(key)
+        return offset
+
+    def _append(self, key):
+        encoded = key.encode()
+        size = _padded(LENGTH.size + len(encoded)) + VALUE.size
+        if self._used + size > len(self._map):
+            self._grow(self._used + size)
+        start = self._used
+        LENGTH.pack_into(self._map, start, len(encoded))
+        self._map[start + LENGTH.size:start + LENGTH.size + len(encoded)] = (
+            encoded)
+        offset = start + size - VALUE.size
+        VALUE.pack_into(self._map, offset, 0.0)
+        self._used += size
+        HEADER.pack_into(self._map, 0, self._used)
+        self._offsets[key] = offset
+        return offset
+
+    def _grow(self, needed):
+        size = len(self._map)
+        while size < needed:
+            size *= 2
+        self._map.close()
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+class Store:
+    """Файлы значений текущего процесса; после fork открываются заново."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files = {}
+        self._pid = None
+
+    def add(self, kind, key, amount):
+        with self._lock:
+            self._file(kind).add(key, amount)
+
+    def set(self, kind, key, value):
+        with self._lock:
+            self._file(kind).set(key, value)
+
+    def _file(self, kind):
+        if self._pid != os.getpid():
+            # Файлы родителя остаются ему, у потомка — свои.
+            self._files = {}
+            self._pid = os.getpid()
+        value_file = self._files.get(kind)
+        if value_file is None:
+            directory = settings.METRICS_DIR
+            os.makedirs(directory, exist_ok=True)
+            value_file = ValueFile(
+                os.path.join(directory, f'{kind}_{self._pid}.db'))
+            self._files[kind] = value_file
+        return value_file
+
+    def close(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                for value_file in self._files.values():
+                    value_file.close()
+            self._files = {}
+
+
+STORE = Store()
+METRICS = {}
+
+
+@receiver(setting_changed)
+def reopen_store(setting, **kwargs):
+    # Открытые файлы остались бы в прежнем каталоге.
+    if setting == 'METRICS_DIR':
+        STORE.close()
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect():
+    """Суммы рядов всех процессов: ``{(имя, метки): значение}``."""
+    totals = defaultdict(float)
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.db')):
+        kind, _, pid = os.path.basename(path)[:-3].partition('_')
+        if kind == 'gauge' and not _alive(int(pid)):
+            continue
+        try:
+            with open(path, 'rb') as source:
+                data = source.read()
+        except FileNotFoundError:
+            continue
+        for key, value, _ in _entries(data):
+            name, labels = json.loads(key)
+            totals[name, tuple(map(tuple, labels))] += value
+    return totals
+
+
+def clear():
+    """Удаляет значения всех процессов (при запуске и в тестах)."""
+    STORE.close()
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.db')):
+        os.remove(path)
+
+
+class Metric:
+    kind = 'counter'
+    store = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        METRICS[name] = self
+
+    def _key(self, name, labels, **extra):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f'{self.name}: метки {sorted(labels)} вместо '
+                f'{sorted(self.labelnames)}')
+        return json.dumps(
+            [name, sorted({**labels, **extra}.items())],
+            ensure_ascii=False, separators=(',', ':'))
+
+    def samples(self, totals):
+        return [(name, labels, value)
+                for (name, labels), value in sorted(totals.items())
+                if name == self.name]
+
+
+class Counter(Metric):
+    def inc(self, amount=1, **labels):
+        STORE.add(self.store, self._key(self.name, labels), amount)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+    store = 'gauge'
+
+    def set(self, value, **labels):
+        STORE.set(self.store, self._key(self.name, labels), value)
+
+    def inc(self, amount=1, **labels):
+        STORE.add(self.store, self._key(self.name, labels), amount)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = (*sorted(buckets), math.inf)
+
+    def observe(self, value, **labels):
+        # Корзина хранит свои наблюдения, нарастающий итог — в render.
+        bound = next(bound for bound in self.buckets if value <= bound)
+        STORE.add(self.store, self._key(
+            f'{self.name}_bucket', labels, le=_format(bound)), 1)
+        STORE.add(self.store, self._key(f'{self.name}_sum', labels), value)
+        STORE.add(self.store, self._key(f'{self.name}_count', labels), 1)
+
+    def samples(self, totals):
+        series = defaultdict(dict)
+        for (name, labels), value in totals.items():
+            if name == f'{self.name}_bucket':
+                labels = dict(labels)
+                bound = float(labels.pop('le'))
+                series[tuple(sorted(labels.items()))][bound] = value
+        samples = []
+        for labels, counts in sorted(series.items()):
+            cumulative = 0
+            for bound in self.buckets:
+                cumulative += counts.get(bound, 0)
+                samples.append((f'{self.name}_bucket',
+                                (*labels, ('le', _format(bound))),
+                                cumulative))
+            for suffix in ('_sum', '_count'):
+                name = self.name + suffix
+                samples.append((name, labels, totals[name, labels]))
+        return samples
+
+
+def _format(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return f'{value:.1f}'
+    return repr(float(value))
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\').replace('\n', r'\n')
+            .replace('"', r'\"'))
+
+
+def render():
+    """Все метрики в текстовом формате Prometheus 0.0.4."""
+    totals = collect()
+    lines = []
+    for metric in sorted(METRICS.values(), key=lambda metric: metric.name):
+        lines.append(f'# HELP {metric.name} {_escape(metric.documentation)}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples(totals):
+            if labels:
+                pairs = ','.join(f'{label}="{_escape(label_value)}"'
+                                 for label, label_value in labels)
+                name = f'{name}{{{pairs}}}'
+            lines.append(f'{name} {_format(value)}')
+    return '\n'.join(lines) + '\n'
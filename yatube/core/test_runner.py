@@ -0,0 +1,48 @@
+"""
+Тестовый раннер: файловый кэш и метрики тестов — во временном каталоге.
+
+Иначе тесты читали бы и чистили (``cache.clear()``, ``prometheus.clear``)
+те же файлы, что запущенный рядом сервер разработки. Под py.test то же
+делает ``isolated_environment`` из conftest.py в корне репозитория.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def isolated_settings(workdir):
+    """Настройки с путями внутри временного каталога."""
+    return {
+        'CACHES': {**settings.CACHES, 'default': {
+            **settings.CACHES['default'],
+            'LOCATION': os.path.join(workdir, 'cache.sqlite3'),
+        }},
+        'METRICS_DIR': os.path.join(workdir, 'metrics'),
+    }
+
+
+@contextmanager
+def isolated_environment():
+    workdir = tempfile.mkdtemp(prefix='yatube-tests-')
+    try:
+        with override_settings(**isolated_settings(workdir)):
+            yield workdir
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+class IsolatedTestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.isolation = isolated_environment()
+        self.isolation.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self.isolation.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
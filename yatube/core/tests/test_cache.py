@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+from multiprocessing import get_context
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+TEMP_CACHE_DIR = tempfile.mkdtemp()
+
+
+def make_cache(max_entries=300):
+    return SQLiteCache(
+        os.path.join(TEMP_CACHE_DIR, 'cache.sqlite3'),
+        {'OPTIONS': {'MAX_ENTRIES': max_entries, 'CULL_FREQUENCY': 10}})
+
+
+def bump_version(cache, times):
+    for _ in range(times):
+        cache.incr('version')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.cache = make_cache()
+        self.cache.clear()
+
+    def test_basic_operations(self):
+        """set/get/add/delete и истечение срока."""
+        self.cache.set('key', {'a': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'a': [1, 2]})
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.cache.set('expired', 1, timeout=-1)
+        self.assertIsNone(self.cache.get('expired'))
+        self.assertTrue(self.cache.add('expired', 2))
+        self.cache.delete('key')
+        self.assertNotIn('key', self.cache)
+
+    def test_many(self):
+        """get_many/set_many работают с набором ключей целиком."""
+        self.cache.set_many({'a': 1, 'b': 'два', 'c': None})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c', 'd']),
+                         {'a': 1, 'b': 'два', 'c': None})
+        self.cache.delete_many(['a', 'b'])
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']), {'c': None})
+
+    def test_incr(self):
+        """incr меняет целые на месте и падает на отсутствующем ключе."""
+        self.cache.set('counter', 1)
+        self.assertEqual(self.cache.incr('counter', 5), 6)
+        self.assertEqual(self.cache.decr('counter'), 5)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_big_integers(self):
+        """Целые за пределами INTEGER хранятся и увеличиваются без потерь."""
+        self.cache.set('big', 2 ** 64)
+        self.assertEqual(self.cache.get('big'), 2 ** 64)
+        self.assertEqual(self.cache.incr('big'), 2 ** 64 + 1)
+        self.cache.set('edge', 2 ** 63 - 1)
+        self.assertEqual(self.cache.incr('edge'), 2 ** 63)
+        self.assertEqual(self.cache.get('edge'), 2 ** 63)
+        self.cache.set('low', -2 ** 63)
+        self.assertEqual(self.cache.decr('low'), -2 ** 63 - 1)
+        self.cache.set('small', 1)
+        self.assertEqual(self.cache.incr('small', 2 ** 70), 2 ** 70 + 1)
+
+    def test_values_are_shared_between_instances(self):
+        """Запись одного экземпляра видна другому (другому процессу)."""
+        self.cache.set('shared', 'value')
+        self.assertEqual(make_cache().get('shared'), 'value')
+
+    def test_incr_is_atomic_across_processes(self):
+        """Параллельные incr из разных процессов не теряются."""
+        self.cache.set('version', 0)
+        # fork: дочерние процессы наследуют объект кэша с соединением
+        # родителя и должны открыть своё.
+        context = get_context('fork')
+        workers = [context.Process(target=bump_version,
+                                   args=(self.cache, 50))
+                   for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('version'), 200)
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = make_cache(max_entries=10)
+        cache.set_many({f'key{x}': x for x in range(10)})
+        cache._connection().execute(
+            "UPDATE cache SET accessed = 0 WHERE key LIKE '%key0'")
+        cache._connection().execute(
+            "UPDATE cache SET accessed = 1 WHERE key LIKE '%key1'")
+        cache.get('key0')
+        cache.set('key10', 10)
+        self.assertIsNotNone(cache.get('key0'))
+        self.assertIsNone(cache.get('key1'))
+        self.assertIsNotNone(cache.get('key10'))
+
+    def test_size_checked_once_per_interval(self):
+        """count(*) для вытеснения — не на каждой записи."""
+        cache = make_cache(max_entries=1000)
+        with mock.patch.object(cache, '_cull', wraps=cache._cull) as cull:
+            for x in range(25):
+                cache.set(f'key{x}', x)
+            cache.set_many({f'many{x}': x for x in range(10)})
+        self.assertEqual(cull.call_count, 3)
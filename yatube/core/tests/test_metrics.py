@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from core.middleware import RequestMetricsMiddleware
+from core.tests.test_prometheus import TEMP_METRICS_DIR
+from posts.models import Post
+
+User = get_user_model()
+
+
+@override_settings(REQUEST_METRICS_SAMPLE_RATE=1.0,
+                   METRICS_DIR=TEMP_METRICS_DIR)
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.client = Client()
+
+    def test_samples_aggregated_by_url_name(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.client.get(url)
+        totals = metrics.snapshot()['posts:index']
+        self.assertEqual(totals['requests'], 2)
+        self.assertGreater(totals['queries'], 0)
+        self.assertGreater(totals['sql_time'], 0)
+        self.assertGreater(totals['template_time'], 0)
+        self.assertGreater(totals['cache_hits'] + totals['cache_misses'], 0)
+        self.client.get('/missing/')
+        self.assertEqual(metrics.snapshot()['unresolved']['requests'], 1)
+
+    def test_query_count_matches_executed_queries(self):
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        # Первый показ создаёт счётчики автора и кладёт блоки постов
+        # в кэш, замеряем второй: миниатюры уже не читаются.
+        self.client.get(url)
+        metrics.reset()
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        self.assertEqual(metrics.snapshot()['posts:profile']['queries'], 3)
+
+    def test_server_timing_only_for_staff(self):
+        url = reverse('posts:index')
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        self.client.force_login(self.author)
+        self.assertNotIn('Server-Timing', self.client.get(url))
+        self.client.force_login(self.staff)
+        header = self.client.get(url)['Server-Timing']
+        self.assertRegex(header, r'^db;dur=[\d.]+;desc="\d+ queries", ')
+        self.assertIn('tpl;dur=', header)
+        self.assertIn('total;dur=', header)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_staff_header_without_sampling(self):
+        self.client.force_login(self.staff)
+        self.assertIn('Server-Timing',
+                      self.client.get(reverse('posts:index')))
+        self.assertEqual(metrics.snapshot(), {})
+
+    @override_settings(METRICS_EXPORT=False, REQUEST_METRICS_SAMPLE_RATE=0,
+                       REQUEST_METRICS_STAFF=False)
+    def test_disabled_middleware_not_used(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestMetricsMiddleware(lambda request: None)
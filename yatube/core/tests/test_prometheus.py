@@ -0,0 +1,177 @@
+import os
+import shutil
+import tempfile
+from multiprocessing import get_context
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core import prometheus
+from posts.models import Post
+
+TEMP_METRICS_DIR = tempfile.mkdtemp()
+User = get_user_model()
+
+
+def count_in_child(counter, gauge):
+    counter.inc(2, kind='child')
+    gauge.set(7)
+
+
+@override_settings(METRICS_DIR=TEMP_METRICS_DIR)
+class RegistryTests(SimpleTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        prometheus.clear()
+        self.addCleanup(prometheus.clear)
+
+    def metric(self, metric_class, name, *args, **kwargs):
+        metric = metric_class(name, *args, **kwargs)
+        self.addCleanup(prometheus.METRICS.pop, name)
+        return metric
+
+    def test_render_exposition_format(self):
+        counter = self.metric(prometheus.Counter, 'test_events_total',
+                              'События "тест".', ['kind'])
+        histogram = self.metric(prometheus.Histogram, 'test_seconds',
+                                'Время.', buckets=(0.1, 1))
+        counter.inc(kind='a\n"b"')
+        counter.inc(2.5, kind='a\n"b"')
+        for value in (0.05, 0.5, 0.7, 3):
+            histogram.observe(value)
+        text = prometheus.render()
+        self.assertIn('# HELP test_events_total События \\"тест\\".\n'
+                      '# TYPE test_events_total counter\n'
+                      'test_events_total{kind="a\\n\\"b\\""} 3.5\n', text)
+        self.assertIn('# TYPE test_seconds histogram\n'
+                      'test_seconds_bucket{le="0.1"} 1.0\n'
+                      'test_seconds_bucket{le="1.0"} 3.0\n'
+                      'test_seconds_bucket{le="+Inf"} 4.0\n'
+                      'test_seconds_sum 4.25\n'
+                      'test_seconds_count 4.0\n', text)
+
+    def test_wrong_labels(self):
+        counter = self.metric(prometheus.Counter, 'test_labeled_total',
+                              'С метками.', ['kind'])
+        with self.assertRaises(ValueError):
+            counter.inc(other='x')
+
+    def test_values_summed_across_processes(self):
+        """Счётчики процессов складываются, датчики умерших — нет."""
+        counter = self.metric(prometheus.Counter, 'test_shared_total',
+                              'Общий счётчик.', ['kind'])
+        gauge = self.metric(prometheus.Gauge, 'test_depth', 'Очередь.')
+        counter.inc(kind='child')
+        gauge.set(1)
+        child = get_context('fork').Process(
+            target=count_in_child, args=(counter, gauge))
+        child.start()
+        child.join()
+        totals = prometheus.collect()
+        self.assertEqual(totals['test_shared_total', (('kind', 'child'),)], 3)
+        self.assertEqual(totals['test_depth', ()], 1)
+        self.assertEqual(len(os.listdir(TEMP_METRICS_DIR)), 4)
+
+    def test_file_grows_and_reopens(self):
+        counter = self.metric(prometheus.Counter, 'test_many_total',
+                              'Много рядов.', ['index'])
+        for index in range(3000):
+            counter.inc(index, index=index)
+        path = os.path.join(TEMP_METRICS_DIR, f'counter_{os.getpid()}.db')
+        self.assertGreater(os.path.getsize(path), prometheus.INITIAL_SIZE)
+        # Процесс с тем же pid продолжает значения из файла.
+        value_file = prometheus.ValueFile(path)
+        key = counter._key('test_many_total', {'index': 2999})
+        value_file.add(key, 1)
+        value_file.close()
+        self.assertEqual(
+            prometheus.collect()['test_many_total', (('index', 2999),)],
+            3000)
+
+
+@override_settings(METRICS_DIR=TEMP_METRICS_DIR, METRICS_TOKEN='secret',
+                   METRICS_ALLOWED_IPS=[])
+class MetricsViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        prometheus.clear()
+        self.addCleanup(prometheus.clear)
+        self.client = Client()
+
+    def test_request_series(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        text = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+        ).content.decode()
+        for line in (
+            'yatube_http_request_duration_seconds_count'
+            '{method="GET",view="posts:index"} 2.0',
+            'yatube_http_requests_total'
+            '{method="GET",status="200",view="posts:index"} 2.0',
+            'yatube_http_response_size_bytes_count{view="posts:index"} 2.0',
+            # Второй раз лента целиком из кэша, до блоков постов не доходит.
+            'yatube_fragment_cache_requests_total'
+            '{fragment="article",result="miss"} 1.0',
+            'yatube_fragment_cache_requests_total'
+            '{fragment="index_feed",result="hit"} 1.0',
+            'yatube_fragment_cache_requests_total'
+            '{fragment="index_feed",result="miss"} 1.0',
+            f'yatube_worker_info{{hostname="{os.uname().nodename}",'
+            f'pid="{os.getpid()}",ppid="{os.getppid()}"}} 1.0',
+            '# TYPE yatube_thumbnail_queue_depth gauge',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line + '\n', text)
+
+    def test_unknown_methods_share_one_series(self):
+        for method in ('FOO', 'BAR'):
+            self.client.generic(method, reverse('posts:index'))
+        text = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+        ).content.decode()
+        self.assertIn('yatube_http_requests_total'
+                      '{method="other",status="200",view="posts:index"} 2.0\n',
+                      text)
+        self.assertNotIn('method="FOO"', text)
+
+    def test_content_type_and_access(self):
+        url = reverse('metrics')
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response['Content-Type'], prometheus.CONTENT_TYPE)
+        # Адрес прокси сам по себе доступа не даёт.
+        for headers in ({}, {'HTTP_AUTHORIZATION': 'Bearer wrong'},
+                        {'HTTP_AUTHORIZATION': 'secret'}):
+            with self.subTest(headers=headers):
+                self.assertEqual(self.client.get(
+                    url, REMOTE_ADDR='127.0.0.1', **headers).status_code,
+                    403)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.client.get(
+                url, HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True))
+        self.assertEqual(
+            self.client.get(url, REMOTE_ADDR='10.0.0.1').status_code, 200)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.2'])
+    def test_allowed_ips_restrict_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(
+            url, REMOTE_ADDR='10.0.0.1',
+            HTTP_AUTHORIZATION='Bearer secret').status_code, 403)
+        self.assertEqual(self.client.get(
+            url, REMOTE_ADDR='10.0.0.2',
+            HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
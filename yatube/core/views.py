@@ -1,5 +1,13 @@
 from http import HTTPStatus
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_safe
+
+from . import prometheus
 
 
 def page_not_found(request, exception):
@@ -22,3 +30,29 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics_allowed(request):
+    """
+    Персонал или запрос с ``Authorization: Bearer <METRICS_TOKEN>``.
+    Непустой METRICS_ALLOWED_IPS дополнительно ограничивает адреса:
+    за обратным прокси все запросы приходят с 127.0.0.1, так что
+    одного адреса для доступа мало.
+    """
+    allowed_ips = settings.METRICS_ALLOWED_IPS
+    if allowed_ips and request.META.get('REMOTE_ADDR') not in allowed_ips:
+        return False
+    if request.user.is_staff:
+        return True
+    token = settings.METRICS_TOKEN
+    return bool(token) and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}')
+
+
+@require_safe
+def metrics(request):
+    """Метрики всех процессов в формате Prometheus."""
+    if not metrics_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(prometheus.render(),
+                        content_type=prometheus.CONTENT_TYPE)
@@ -0,0 +1,246 @@
+"""
+Замеры страниц сайта на синтетических данных (команда benchmark_views).
+
+Для каждого масштаба создаётся набор данных (``populate``) тем же
+генератором, что у команды seed, плюс читатель с подписками на самых
+активных авторов; ленты, счётчики и поисковый индекс пересобираются.
+Затем каждая страница из ``VIEWS`` запрашивается GET-ом анонимом
+и пользователем с подписками (страницы из ``URL_ROLES`` — вместо
+него сотрудником или автором, поиск — с непустым ``q``): один запрос —
+для числа SQL-запросов и пика выделенной памяти (tracemalloc),
+``repeat`` запросов — для перцентилей времени. Кэш к этому моменту
+прогрет первым запросом.
+
+Результаты сравниваются с сохранённой базой: любой лишний SQL-запрос —
+регрессия, медиана времени и память — если выросли больше чем
+на ``tolerance`` (и на абсолютный порог, чтобы не ловить шум
+на миллисекундах). Время и память сравниваются, только если база снята
+на том же интерпретаторе и машине (``environment``).
+"""
+import math
+import os
+import platform
+import time
+import tracemalloc
+from importlib import import_module
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from . import seeding
+from .models import Follow, Group, Post, User
+
+URL_MODULES = ('posts', 'users', 'about')
+# Страницы, которые можно запрашивать GET-ом: только чтение. Не входят
+# подписка и отписка (меняют ленты до следующих замеров), add_comment
+# (только POST), выход (завершает сессию) и одноразовая ссылка сброса
+# пароля.
+VIEWS = (
+    'posts:index', 'posts:group_list', 'posts:latest_rss',
+    'posts:latest_atom', 'posts:group_rss', 'posts:group_atom',
+    'posts:author_rss', 'posts:author_atom', 'posts:search',
+    'posts:profile', 'posts:post_detail', 'posts:post_create',
+    'posts:post_edit', 'posts:comment_list', 'posts:export_data',
+    'posts:follow_index',
+    'users:signup', 'users:login', 'users:password_change_form',
+    'users:password_change_done', 'users:password_reset_form',
+    'users:password_reset_done', 'users:password_reset_complete',
+    'about:author', 'about:tech',
+)
+ROLES = ('anonymous', 'user')
+# Кто вместо пользователя открывает страницу: читателю она отдала бы
+# только редирект.
+URL_ROLES = {'posts:export_data': 'staff', 'posts:post_edit': 'author'}
+# Что записывается рядом с результатами: время и память сравнимы
+# только на том же интерпретаторе и машине.
+ENVIRONMENT = ('python', 'implementation', 'django', 'platform',
+               'machine', 'processor', 'cpus')
+# Параметры GET: без q поиск показывает пустую форму, а не FTS-запрос.
+URL_QUERIES = {'posts:search': {'q': seeding.WORDS[0]}}
+# Строк на единицу масштаба.
+PER_SCALE = {'authors': 20, 'groups': 2, 'posts': 200, 'comments': 400}
+READER_FOLLOWS = 10
+AUTHOR_FOLLOWS = 5
+# Пороги сравнения с базой, ниже которых разница — шум.
+LATENCY_FLOOR_MS = 1.0
+MEMORY_FLOOR_KIB = 64
+
+
+class Dataset:
+    """Данные масштаба и объекты, на которые ссылаются URL."""
+
+    def __init__(self, reader, staff, author, group, post):
+        self.reader = reader
+        self.staff = staff
+        self.author = author
+        self.group = group
+        self.post = post
+
+    def login(self, role):
+        """Пользователь роли; None — аноним."""
+        return {'anonymous': None, 'user': self.reader, 'staff': self.staff,
+                'author': self.author}[role]
+
+    def url_kwargs(self):
+        return {
+            'slug': self.group.slug,
+            'username': self.author.username,
+            'post_id': self.post.pk,
+            'resource': 'posts',
+        }
+
+
+def populate(scale, seed=0):
+    """Набор данных масштаба ``scale``; при том же seed — тот же."""
+    plan = seeding.Plan(
+        users=PER_SCALE['authors'] * scale,
+        groups=PER_SCALE['groups'] * scale,
+        posts=PER_SCALE['posts'] * scale,
+        comments=PER_SCALE['comments'] * scale,
+        follows_per_user=AUTHOR_FOLLOWS, seed=seed, prefix='author')
+    seeding.seed(plan, rebuild_derived=False)
+    # Читатель подписан на самых активных авторов (первых по Ципфу).
+    reader = User.objects.create(username='reader')
+    staff = User.objects.create(username='staff', is_staff=True)
+    Follow.objects.bulk_create(
+        Follow(user=reader, author_id=plan.user_base + index)
+        for index in range(READER_FOLLOWS))
+    seeding.rebuild()
+    author = User.objects.get(pk=plan.user_base)
+    return Dataset(reader, staff, author,
+                   Group.objects.get(pk=plan.group_base),
+                   Post.objects.filter(author=author).latest('pub_date'))
+
+
+def view_urls(dataset):
+    """
+    Пары (имя URL, путь) для маршрутов URL_MODULES из VIEWS; к пути
+    добавляются параметры из URL_QUERIES.
+    """
+    values = dataset.url_kwargs()
+    for namespace in URL_MODULES:
+        for pattern in import_module(f'{namespace}.urls').urlpatterns:
+            name = f'{namespace}:{pattern.name}'
+            if name not in VIEWS:
+                continue
+            kwargs = {key: values[key]
+                      for key in pattern.pattern.converters}
+            path = reverse(name, kwargs=kwargs)
+            if name in URL_QUERIES:
+                path = f'{path}?{urlencode(URL_QUERIES[name])}'
+            yield name, path
+
+
+def url_role(name, role):
+    """Роль, под которой страница замеряется вместо ``role``."""
+    return URL_ROLES.get(name, role) if role == 'user' else role
+
+
+def percentile(ordered, fraction):
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def measure(client, path, repeat, login=None):
+    """
+    Замер одного URL: код ответа, SQL-запросы, пик памяти в КиБ
+    и перцентили времени в мс. ``login`` — пользователь, под которым
+    идут запросы (logout его разлогинивает, поэтому вход перед каждым).
+    """
+    def get():
+        if login is not None and '_auth_user_id' not in client.session:
+            client.force_login(login)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = client.get(path)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - started) * 1000
+        return response, elapsed, len(queries)
+
+    get()
+    tracemalloc.start()
+    try:
+        response, _, query_count = get()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    timings = sorted(get()[1] for _ in range(repeat))
+    return {
+        'status': response.status_code,
+        'queries': query_count,
+        'peak_kib': round(peak / 1024, 1),
+        'p50_ms': round(percentile(timings, 0.5), 3),
+        'p90_ms': round(percentile(timings, 0.9), 3),
+        'p99_ms': round(percentile(timings, 0.99), 3),
+    }
+
+
+def run(scale, repeat, seed=0):
+    """Результаты всех URL обеих ролей на наборе масштаба ``scale``."""
+    cache.clear()
+    dataset = populate(scale, seed)
+    clients = {}
+    results = []
+    for role in ROLES:
+        for name, path in view_urls(dataset):
+            who = url_role(name, role)
+            client = clients.setdefault(who, Client())
+            results.append({
+                'scale': scale, 'role': who, 'url': name, 'path': path,
+                **measure(client, path, repeat, dataset.login(who)),
+            })
+    return results
+
+
+def environment():
+    """Интерпретатор и машина, на которых сняты замеры."""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def same_environment(report, baseline):
+    return all(report.get(key) == baseline.get(key) for key in ENVIRONMENT)
+
+
+def result_key(result):
+    return result['scale'], result['role'], result['url']
+
+
+def compare(results, baseline, tolerance, timings=True):
+    """
+    Регрессии относительно базы — строки для отчёта. Без ``timings``
+    сравниваются только SQL-запросы.
+    """
+    base = {result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = base.get(result_key(result))
+        if old is None:
+            continue
+        where = '{} {} {}'.format(*result_key(result))
+        if result['queries'] > old['queries']:
+            regressions.append(
+                f'{where}: SQL-запросов {old["queries"]} -> '
+                f'{result["queries"]}')
+        if not timings:
+            continue
+        # Хвосты (p90, p99) на десятках повторов — шум, их не сравниваем.
+        for field, floor, unit in (('p50_ms', LATENCY_FLOOR_MS, 'мс'),
+                                   ('peak_kib', MEMORY_FLOOR_KIB, 'КиБ')):
+            if result[field] > old[field] * (1 + tolerance) + floor:
+                regressions.append(
+                    f'{where}: {field} {old[field]} -> {result[field]} '
+                    f'{unit}')
+    return regressions
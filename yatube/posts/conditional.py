@@ -0,0 +1,112 @@
+"""
+ETag для условных GET: если страница не менялась, view отвечает
+304 Not Modified, не выполняя своих запросов и не рендеря шаблон.
+
+ETag каждой страницы собирается из одного запроса по индексам
+(последние ``updated`` постов, ``created`` комментариев, id
+миниатюр и счётчики — подзапросами), а для общей ленты — из версии
+постов в кэше, которую сбрасывают сигналы. Имена авторов и
+комментаторов на страницах групп и постов учитывает версия авторов
+в кэше: её увеличивает переименование пользователя. В него входят пользователь
+и полный путь с параметрами: шапка страницы и номер страницы/курсор
+тоже часть ответа.
+"""
+import hashlib
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Max, OuterRef, Subquery
+
+from . import fragments
+from .models import Comment, Group, Post, Thumbnail
+
+User = get_user_model()
+
+
+def make_etag(request, *parts):
+    raw = '|'.join(
+        str(part) for part in (request.user.pk, request.get_full_path(),
+                               *parts))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def index_etag(request):
+    return make_etag(
+        request, fragments.get_version(fragments.POSTS_VERSION_KEY))
+
+
+def feed_etag(request, *args, **kwargs):
+    # RSS/Atom одинаковы для всех, пользователь в ETag не входит.
+    # Параметров ленты не читают: ?x=... не должен плодить копии в кэше.
+    raw = '|'.join((request.path, str(
+        fragments.get_version(fragments.POSTS_VERSION_KEY))))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def related_aggregate(queryset, field, aggregate):
+    """
+    Агрегат по связанным строкам подзапросом: внешний запрос остаётся
+    поиском одной строки по ключу, без GROUP BY по всем её полям.
+    """
+    return Subquery(queryset.filter(**{field: OuterRef('pk')}).order_by(
+    ).values(field).annotate(value=aggregate).values('value'))
+
+
+def first_row(queryset, *fields):
+    # Без first(): его ORDER BY pk поверх подзапросов ни к чему.
+    rows = list(queryset.order_by().values_list(*fields)[:1])
+    return rows[0] if rows else None
+
+
+def group_posts_etag(request, slug):
+    row = first_row(
+        Group.objects.filter(slug=slug).annotate(
+            last_updated=related_aggregate(
+                Post.objects, 'group', Max('updated')),
+            posts_count=related_aggregate(Post.objects, 'group', Count('pk')),
+            last_thumbnail=related_aggregate(
+                Thumbnail.objects, 'post__group', Max('pk')),
+        ),
+        'title', 'description', 'last_updated', 'posts_count',
+        'last_thumbnail')
+    return None if row is None else make_etag(
+        request, *row, fragments.get_version(fragments.AUTHORS_VERSION_KEY))
+
+
+def profile_etag(request, username):
+    row = first_row(
+        User.objects.filter(username=username).annotate(
+            last_updated=related_aggregate(
+                Post.objects, 'author', Max('updated')),
+            last_thumbnail=related_aggregate(
+                Thumbnail.objects, 'post__author', Max('pk')),
+        ),
+        'stats__posts_count', 'stats__follower_count',
+        'stats__following_count', 'first_name', 'last_name', 'last_updated',
+        'last_thumbnail')
+    return stats_etag(request, row)
+
+
+def post_detail_etag(request, post_id):
+    row = first_row(
+        Post.objects.filter(pk=post_id).annotate(
+            last_comment=related_aggregate(
+                Comment.objects, 'post', Max('created')),
+            comments_count=related_aggregate(
+                Comment.objects, 'post', Count('pk')),
+            # Готовые миниатюры пересоздаются с новыми id.
+            last_thumbnail=related_aggregate(
+                Thumbnail.objects, 'post', Max('pk')),
+        ),
+        'author__stats__posts_count', 'updated', 'last_comment',
+        'comments_count', 'last_thumbnail')
+    return stats_etag(
+        request, row, fragments.get_version(fragments.AUTHORS_VERSION_KEY))
+
+
+def stats_etag(request, row, *parts):
+    # Первое поле — счётчик из UserStats. Строку счётчиков view создаёт
+    # при первом показе: до этого ETag не отдаём, иначе он сменится
+    # без изменений на странице.
+    if row is None or row[0] is None:
+        return None
+    return make_etag(request, *row, *parts)
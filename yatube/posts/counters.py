@@ -0,0 +1,80 @@
+"""
+Денормализованные счётчики пользователя (UserStats).
+
+Сигналы меняют счётчики атомарным UPDATE в той же транзакции, что и
+запись Post/Follow. Строка счётчиков создаётся лениво при первом чтении
+пересчётом; расхождения чинит команда reconcile_counters.
+"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Follow, Post, User, UserStats
+
+COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'follower_count': (Follow, 'user'),
+    'following_count': (Follow, 'author'),
+}
+
+
+def bump(user_id, field, delta):
+    stats = UserStats.objects.filter(user_id=user_id)
+    if delta < 0:
+        # Счётчик не уходит в минус даже при расхождении.
+        stats = stats.filter(**{f'{field}__gte': -delta})
+    stats.update(**{field: F(field) + delta})
+
+
+def _count_subquery(model, field):
+    counts = model.objects.filter(**{field: OuterRef('pk')}).order_by(
+    ).values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def counted_users():
+    """Пользователи с точными значениями счётчиков в аннотациях."""
+    return User.objects.annotate(**{
+        f'actual_{name}': _count_subquery(model, field)
+        for name, (model, field) in COUNTERS.items()
+    })
+
+
+def get_stats(user):
+    """Счётчики пользователя; при отсутствии строки она пересчитывается."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        actual = counted_users().get(pk=user.pk)
+        stats, _ = UserStats.objects.get_or_create(user=user, defaults={
+            name: getattr(actual, f'actual_{name}') for name in COUNTERS
+        })
+        user.stats = stats
+        return stats
+
+
+def reconcile(batch_size=1000):
+    """Исправляет расхождения счётчиков, возвращает число исправлений."""
+    fixed = 0
+    batch = []
+    users = counted_users().select_related('stats').order_by('pk')
+    for user in users.iterator(chunk_size=batch_size):
+        actual = {name: getattr(user, f'actual_{name}') for name in COUNTERS}
+        try:
+            stats = user.stats
+        except UserStats.DoesNotExist:
+            UserStats.objects.create(user=user, **actual)
+            fixed += 1
+            continue
+        if any(getattr(stats, name) != value
+               for name, value in actual.items()):
+            for name, value in actual.items():
+                setattr(stats, name, value)
+            batch.append(stats)
+        if len(batch) >= batch_size:
+            UserStats.objects.bulk_update(batch, list(COUNTERS))
+            fixed += len(batch)
+            batch = []
+    if batch:
+        UserStats.objects.bulk_update(batch, list(COUNTERS))
+        fixed += len(batch)
+    return fixed
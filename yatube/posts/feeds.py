@@ -0,0 +1,133 @@
+"""
+RSS и Atom для общей ленты, групп и авторов.
+
+Готовый ответ лежит в кэше под ключом из версии постов (её сбрасывают
+сигналы Post, Group и переименование автора) и пути запроса без строки
+параметров, ETag — тот же хэш. Поэтому ответ 304 на If-None-Match стоит
+одного чтения версии из кэша, без запросов к базе и без рендеринга.
+"""
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.text import Truncator
+from django.views.decorators.http import condition
+
+from . import conditional
+from .models import Group, Post, User
+
+
+class PostsFeed(Feed):
+    def items(self, obj=None):
+        return self.posts(obj).select_related(
+            'author', 'group')[:settings.FEED_ITEMS]
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def item_title(self, item):
+        return Truncator(item.text).words(8)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.pk})
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group else []
+
+
+class LatestPostsFeed(PostsFeed):
+    title = 'Yatube: последние записи'
+    description = 'Последние записи на сайте'
+
+    def link(self):
+        return reverse('posts:index')
+
+
+class GroupPostsFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def posts(self, group):
+        return group.posts.all()
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def description(self, group):
+        return group.description
+
+    def link(self, group):
+        return reverse('posts:group_list', kwargs={'slug': group.slug})
+
+
+class AuthorPostsFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def posts(self, author):
+        return author.posts.all()
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def description(self, author):
+        return f'Записи пользователя {author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile',
+                       kwargs={'username': author.username})
+
+
+class AtomMixin:
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj=None):
+        return self._get_dynamic_attr('description', obj)
+
+
+class LatestPostsAtomFeed(AtomMixin, LatestPostsFeed):
+    pass
+
+
+class GroupPostsAtomFeed(AtomMixin, GroupPostsFeed):
+    pass
+
+
+class AuthorPostsAtomFeed(AtomMixin, AuthorPostsFeed):
+    pass
+
+
+def cached_feed(feed):
+    """View ленты с кэшем готового ответа и ETag по версии постов."""
+    @condition(etag_func=conditional.feed_etag)
+    def view(request, *args, **kwargs):
+        key = 'feed:' + conditional.feed_etag(request)
+        response = cache.get(key)
+        if response is None:
+            response = feed(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response, settings.FEED_CACHE_TIMEOUT)
+        return response
+    return view
+
+
+latest_rss = cached_feed(LatestPostsFeed())
+latest_atom = cached_feed(LatestPostsAtomFeed())
+group_rss = cached_feed(GroupPostsFeed())
+group_atom = cached_feed(GroupPostsAtomFeed())
+author_rss = cached_feed(AuthorPostsFeed())
+author_atom = cached_feed(AuthorPostsAtomFeed())
@@ -0,0 +1,123 @@
+"""
+Версии кэшированных фрагментов лент.
+
+Фрагменты лент кэшируются тегом ``{% cache %}`` с версией в ключе:
+общая лента зависит от версии постов, лента подписок — ещё и от версии
+подписок пользователя. Сигналы Post и Follow увеличивают версии, и все
+старые фрагменты сразу перестают читаться, а не живут до истечения TTL.
+
+Внутри них лежат блоки отдельных постов (includes/article.html) с ключом
+от ``Post.updated`` и показанных в блоке полей автора и группы: правка
+поста или переименование просто дают новый ключ, а страница ленты
+собирается одним get_many. Миниатюры читаются только для блоков,
+которых в кэше не нашлось.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+from core import metrics
+
+POSTS_VERSION_KEY = 'feed:version:posts'
+# Растёт при смене показываемого имени любого пользователя: оно есть
+# на страницах групп и постов, но не в их ETag из базы.
+AUTHORS_VERSION_KEY = 'feed:version:authors'
+CURSOR_PARAMS = ('after', 'before', 'page')
+
+
+def follows_version_key(user_id):
+    return f'feed:version:follows:{user_id}'
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Ключ вытеснен: новая версия от текущего времени заведомо больше
+        # прежней, так что старые фрагменты не воскреснут.
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def feed_page_key(request):
+    """Страница ленты так, как её запросили: номером или курсором."""
+    return '&'.join(
+        f'{param}={request.GET[param]}'
+        for param in CURSOR_PARAMS if param in request.GET
+    ) or 'page=1'
+
+
+def feed_cache(request, user=None):
+    """Контекст для ``{% cache %}`` фрагмента ленты."""
+    version = str(get_version(POSTS_VERSION_KEY))
+    if user is not None:
+        version += f'.{get_version(follows_version_key(user.pk))}'
+    return {
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed_version': version,
+        'feed_page': feed_page_key(request),
+    }
+
+
+def article_key(post, print_group_link, print_author_link):
+    flags = f'{int(bool(print_group_link))}{int(bool(print_author_link))}'
+    # Автор и группа приходят с постом (select_related), а их правка
+    # не меняет post.updated: в ключ идёт то, что из них показано.
+    shown = []
+    if print_author_link:
+        shown += [post.author.username, post.author.get_full_name()]
+    if print_group_link and post.group_id:
+        shown.append(post.group.slug)
+    stamp = hashlib.md5('|'.join(shown).encode()).hexdigest()[:12]
+    return f'article:{post.pk}:{post.updated.timestamp()}:{flags}:{stamp}'
+
+
+def forget_articles(posts):
+    """Удаляет блоки постов из кэша во всех вариантах показа."""
+    cache.delete_many([
+        article_key(post, print_group_link, print_author_link)
+        for post in posts
+        for print_group_link in (False, True)
+        for print_author_link in (False, True)
+    ])
+
+
+def render_articles(posts, print_group_link=False, print_author_link=False,
+                    prepare=None):
+    """
+    HTML блоков постов: из кэша, недостающие рендерятся и кладутся.
+    ``prepare`` получает список непопавших в кэш постов перед рендером
+    (например, чтобы одним запросом подгрузить их миниатюры).
+    """
+    posts = list(posts)
+    keys = [article_key(post, print_group_link, print_author_link)
+            for post in posts]
+    cached = cache.get_many(keys)
+    missed = []
+    for key, post in zip(keys, posts):
+        metrics.count_fragment('article', key in cached)
+        if key not in cached:
+            missed.append((key, post))
+    if missed and prepare is not None:
+        prepare([post for _, post in missed])
+    rendered = {
+        key: render_to_string('includes/article.html', {
+            'post': post,
+            'PRINT_GROUP_LINK': print_group_link,
+            'PRINT_AUTHOR_LINK': print_author_link,
+        })
+        for key, post in missed
+    }
+    if rendered:
+        cache.set_many(rendered, settings.ARTICLE_CACHE_TIMEOUT)
+    return [cached[key] if key in cached else rendered[key] for key in keys]
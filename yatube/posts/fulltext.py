@@ -0,0 +1,182 @@
+"""
+Полнотекстовый поиск по Post.text на SQLite FTS5.
+
+Индекс ``posts_post_fts`` хранит копию текста поста с rowid = id поста
+и обновляется сигналами Post; команда rebuild_search_index пересобирает
+его целиком. Результаты упорядочены по релевантности (bm25) и листаются
+курсором по ключу (rank, id). На других СУБД поиск сводится
+к ``text__icontains``.
+"""
+import hashlib
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .paginators import CursorPaginator, pack_cursor, unpack_cursor
+
+FTS_TABLE = 'posts_post_fts'
+WORD_RE = re.compile(r'\w+')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """
+    Запрос пользователя как выражение MATCH: все слова обязательны,
+    последнее ищется как префикс. Синтаксис FTS5 из ввода не проходит.
+    """
+    words = WORD_RE.findall(query)
+    if not words:
+        return ''
+    phrases = [f'"{word}"' for word in words]
+    phrases[-1] += '*'
+    return ' '.join(phrases)
+
+
+def index_post(post):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post.pk])
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post.pk, post.text])
+
+
+def index_new_posts(posts):
+    """Добавляет в индекс посты, которых там ещё нет (импорт пачками)."""
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [(post.pk, post.text) for post in posts])
+
+
+def unindex_post(pk):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def rebuild():
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) '
+            f'SELECT id, text FROM {Post._meta.db_table}')
+
+
+class RawSubquery(RawSQL):
+    """
+    RawSQL для правой части ``__in``: без своих скобок. Лукап сам
+    берёт подзапрос в скобки, а ``IN ((SELECT ...))`` в SQLite —
+    скалярный подзапрос, то есть только первая строка.
+    """
+
+    def as_sql(self, compiler, connection):
+        return self.sql, self.params
+
+
+def matching_ids(query):
+    """Подзапрос id постов, подходящих под запрос, для pk__in."""
+    return RawSubquery(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)])
+
+
+class SearchResults:
+    """Посты, подходящие под запрос, в порядке релевантности."""
+
+    model = Post
+
+    def __init__(self, query):
+        self.match = match_expression(query)
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s', [self.match])
+            return cursor.fetchone()[0]
+
+    def fetch(self, limit, offset=0, bound=None, forward=True):
+        """
+        Срез результатов. ``bound`` — ключ (rank, id), от которого
+        идём по ходу выдачи (forward) или против него.
+        """
+        if not self.match:
+            return []
+        sql = (f'SELECT rowid, rank FROM {FTS_TABLE} '
+               f'WHERE {FTS_TABLE} MATCH %s')
+        params = [self.match]
+        if bound is not None:
+            op = '>' if forward else '<'
+            sql += f' AND (rank {op} %s OR (rank = %s AND rowid {op} %s))'
+            rank, pk = bound
+            params += [rank, rank, pk]
+        direction = '' if forward else ' DESC'
+        sql += (f' ORDER BY rank{direction}, rowid{direction} '
+                f'LIMIT %s OFFSET %s')
+        params += [limit, offset]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in rows])
+        results = []
+        for pk, rank in rows:
+            if pk in posts:
+                posts[pk].search_rank = rank
+                results.append(posts[pk])
+        return results
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная выдача поиска по ключу (rank, id)."""
+
+    def __init__(self, query, per_page, **kwargs):
+        super().__init__(SearchResults(query), per_page, **kwargs)
+
+    def encode_cursor(self, item, number):
+        return pack_cursor(repr(item.search_rank), item.pk, number)
+
+    def decode_cursor(self, token):
+        return unpack_cursor(token, float)
+
+    def _ordered(self, object_list):
+        return object_list
+
+    def _count_key(self):
+        digest = hashlib.md5(self.object_list.match.encode()).hexdigest()
+        return f'search:count:{digest}'
+
+    def _fetch(self, offset, limit):
+        return self.object_list.fetch(limit, offset=offset)
+
+    def _fetch_after(self, rank, pk, limit):
+        return self.object_list.fetch(limit, bound=(rank, pk))
+
+    def _fetch_before(self, rank, pk, limit):
+        return self.object_list.fetch(limit, bound=(rank, pk), forward=False)
+
+    def _object_list(self, items, offset=None):
+        object_list = Post.objects.filter(pk__in=[item.pk for item in items])
+        object_list._result_cache = items
+        return object_list
+
+
+def search_paginator(query, per_page):
+    if is_available():
+        return SearchPaginator(query, per_page)
+    post_list = Post.objects.filter(
+        text__icontains=query).select_related('author', 'group')
+    return CursorPaginator(post_list, per_page)
@@ -0,0 +1,214 @@
+"""
+Массовый импорт постов из JSONL или CSV (команда import_posts).
+
+Вход читается потоком, посты создаются пачками через bulk_create, по
+транзакции на пачку, так что память не зависит от размера файла:
+в ней одна пачка и словари username -> id и slug -> id, которые
+пополняются запросом на пачку. bulk_create обходит сигналы Post,
+поэтому их работа делается здесь же пачкой: счётчики, поисковый
+индекс, ленты подписок, версия лент и очередь миниатюр.
+
+Поля записи: ``author`` (username), ``text``, необязательные ``group``
+(slug), ``pub_date`` (ISO 8601) и ``image`` — путь к файлу внутри
+каталога картинок.
+"""
+import csv
+import json
+import os
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, fragments, fulltext, thumbnails, timelines
+from .models import Group, Post, User
+from .uploads import process_image
+
+FORMATS = ('jsonl', 'csv')
+
+
+class InvalidRecord(ValueError):
+    """Запись, которую нельзя импортировать; остальные импортируются."""
+
+
+def read_jsonl(stream):
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            yield line_number, InvalidRecord(f'неверный JSON: {error}')
+            continue
+        if not isinstance(record, dict):
+            record = InvalidRecord('запись должна быть объектом')
+        yield line_number, record
+
+
+def read_csv(stream):
+    # Первая строка — заголовок, номера строк считаются с него.
+    for line_number, record in enumerate(csv.DictReader(stream), 2):
+        yield line_number, record
+
+
+READERS = {'jsonl': read_jsonl, 'csv': read_csv}
+
+
+def batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class PostImporter:
+    """
+    Импортирует пачки записей ``(номер строки, словарь)``. Ошибочные
+    записи пропускаются; import_batch возвращает их как (строка, причина).
+    """
+
+    def __init__(self, images_dir=None, create_missing=False):
+        self.images_dir = images_dir and os.path.realpath(images_dir)
+        self.create_missing = create_missing
+        self.authors = {}
+        self.groups = {}
+        self.imported = 0
+        self.skipped = 0
+
+    def import_batch(self, batch):
+        records, errors = [], []
+        for line, record in batch:
+            if isinstance(record, InvalidRecord):
+                errors.append((line, str(record)))
+            else:
+                records.append((line, record))
+        self._resolve_authors(
+            {str(record.get('author') or '') for _, record in records})
+        self._resolve_groups(
+            {str(record['group']) for _, record in records
+             if record.get('group')})
+        posts, dates = [], []
+        for line, record in records:
+            try:
+                post, pub_date = self._build(record)
+            except InvalidRecord as error:
+                errors.append((line, str(error)))
+                continue
+            except ValidationError as error:
+                errors.append((line, ' '.join(error.messages)))
+                continue
+            posts.append(post)
+            dates.append(pub_date)
+        if posts:
+            self._save(posts, dates)
+            fragments.bump(fragments.POSTS_VERSION_KEY)
+        self.skipped += len(errors)
+        return errors
+
+    def _resolve_authors(self, usernames):
+        missing = usernames - self.authors.keys() - {''}
+        if not missing:
+            return
+        if self.create_missing:
+            User.objects.bulk_create(
+                (User(username=username, password=make_password(None))
+                 for username in missing),
+                ignore_conflicts=True)
+        self.authors.update(User.objects.filter(
+            username__in=missing).values_list('username', 'pk'))
+
+    def _resolve_groups(self, slugs):
+        missing = slugs - self.groups.keys()
+        if not missing:
+            return
+        if self.create_missing:
+            Group.objects.bulk_create(
+                (Group(slug=slug, title=slug, description='')
+                 for slug in missing),
+                ignore_conflicts=True)
+        self.groups.update(Group.objects.filter(
+            slug__in=missing).values_list('slug', 'pk'))
+
+    def _build(self, record):
+        author = str(record.get('author') or '')
+        if author not in self.authors:
+            raise InvalidRecord(f'нет автора «{author}»')
+        text = str(record.get('text') or '')
+        if not text.strip():
+            raise InvalidRecord('пустой текст')
+        group = record.get('group') or None
+        if group is not None and str(group) not in self.groups:
+            raise InvalidRecord(f'нет группы «{group}»')
+        pub_date = None
+        if record.get('pub_date'):
+            pub_date = parse_datetime(str(record['pub_date']))
+            if pub_date is None:
+                raise InvalidRecord(f'неверная дата «{record["pub_date"]}»')
+            if timezone.is_naive(pub_date):
+                pub_date = timezone.make_aware(pub_date)
+        post = Post(author_id=self.authors[author], text=text,
+                    group_id=group and self.groups[str(group)])
+        if record.get('image'):
+            post.image = self._store_image(str(record['image']))
+        return post, pub_date
+
+    def _store_image(self, name):
+        if not self.images_dir:
+            raise InvalidRecord('картинка без каталога картинок (--images)')
+        path = os.path.realpath(os.path.join(self.images_dir, name))
+        if os.path.commonpath([path, self.images_dir]) != self.images_dir:
+            raise InvalidRecord(f'картинка вне каталога: {name}')
+        if not os.path.isfile(path):
+            raise InvalidRecord(f'нет файла картинки {name}')
+        # Ошибка чтения одного файла пропускает запись, а не весь импорт.
+        try:
+            with open(path, 'rb') as source:
+                content = process_image(File(source, name=name))
+        except OSError as error:
+            raise InvalidRecord(
+                f'не удалось прочитать картинку {name}: {error}')
+        field = Post._meta.get_field('image')
+        return default_storage.save(
+            field.generate_filename(None, content.name), content)
+
+    @transaction.atomic
+    def _save(self, posts, dates):
+        last_pk = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+        Post.objects.bulk_create(posts)
+        if posts[0].pk is None:
+            # SQLite не возвращает id из bulk_create. Запись в базу одна
+            # на всех, так что новые id — все id больше прежнего максимума.
+            pks = list(Post.objects.filter(pk__gt=last_pk).order_by(
+                'pk').values_list('pk', flat=True))
+            if len(pks) != len(posts):
+                raise RuntimeError(
+                    'Посты добавлялись параллельно с импортом.')
+            for post, pk in zip(posts, pks):
+                post.pk = pk
+        # auto_now_add подменяет дату и в bulk_create: возвращаем исходную.
+        dated = []
+        for post, pub_date in zip(posts, dates):
+            if pub_date is not None:
+                post.pub_date = pub_date
+                dated.append(post)
+        if dated:
+            Post.objects.bulk_update(dated, ['pub_date'])
+        for author_id, total in Counter(
+                post.author_id for post in posts).items():
+            counters.bump(author_id, 'posts_count', total)
+        fulltext.index_new_posts(posts)
+        timelines.fan_out_many(posts)
+        for post in posts:
+            if post.image:
+                thumbnails.enqueue(post.image.name)
+        self.imported += len(posts)
@@ -0,0 +1,118 @@
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет страницы posts, users и about, которые только читают '
+        'данные, на синтетических данных нескольких масштабов: '
+        'перцентили времени, SQL-запросы и пик памяти. Работает '
+        'на отдельной тестовой базе и кэше; сравнивает результат с базой '
+        'замеров и падает на регрессиях. Время и память сравниваются, '
+        'только если база снята на том же интерпретаторе и машине.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', type=int, nargs='+', default=[1, 10])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', metavar='FILE',
+                            help='Куда записать результаты в JSON.')
+        parser.add_argument('--baseline', metavar='FILE',
+                            default=settings.BENCHMARK_BASELINE)
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Записать результаты как новую базу.')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Допустимый рост времени и памяти, доля.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1 or min(options['scales']) < 1:
+            raise CommandError('--repeat и --scales должны быть больше 0.')
+        report = {
+            **benchmarks.environment(),
+            'seed': options['seed'],
+            'repeat': options['repeat'],
+            'results': self.measure(options),
+        }
+        if options['output']:
+            self.write(options['output'], report)
+        if options['update_baseline']:
+            self.write(options['baseline'], report)
+            self.stdout.write(f'База записана в {options["baseline"]}.')
+            return
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(f'Нет базы {options["baseline"]}, '
+                              f'сравнение пропущено.')
+            return
+        with open(options['baseline'], encoding='utf-8') as source:
+            baseline = json.load(source)
+        timings = benchmarks.same_environment(report, baseline)
+        if not timings:
+            self.stdout.write(
+                'База снята в другом окружении ('
+                + ', '.join(f'{key}: {baseline.get(key)}'
+                            for key in benchmarks.ENVIRONMENT)
+                + '); время и память не сравниваются, только SQL-запросы.')
+        regressions = benchmarks.compare(
+            report['results'], baseline['results'], options['tolerance'],
+            timings=timings)
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно базы:\n' + '\n'.join(regressions))
+        self.stdout.write('Регрессий нет.')
+
+    def measure(self, options):
+        self.stdout.write(
+            f'{"scale":>5} {"role":>9} {"url":<34} {"status":>6} '
+            f'{"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"queries":>7} '
+            f'{"KiB":>8}')
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        results = []
+        try:
+            # Свой кэш и каталог метрик: замеры не трогают рабочие.
+            with tempfile.TemporaryDirectory() as workdir, override_settings(
+                ALLOWED_HOSTS=['testserver'],
+                DEBUG=False,
+                CACHES={'default': {
+                    'BACKEND': 'core.cache.SQLiteCache',
+                    'LOCATION': os.path.join(workdir, 'cache.sqlite3'),
+                }},
+                METRICS_DIR=os.path.join(workdir, 'metrics'),
+                REQUEST_METRICS_SAMPLE_RATE=0,
+                THUMBNAIL_WORKERS=0,
+            ):
+                for scale in options['scales']:
+                    with transaction.atomic():
+                        scale_results = benchmarks.run(
+                            scale, options['repeat'], options['seed'])
+                        transaction.set_rollback(True)
+                    for result in scale_results:
+                        self.report(result)
+                    results.extend(scale_results)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        return results
+
+    def report(self, result):
+        self.stdout.write(
+            f'{result["scale"]:>5} {result["role"]:>9} {result["url"]:<34} '
+            f'{result["status"]:>6} {result["p50_ms"]:>8.2f} '
+            f'{result["p90_ms"]:>8.2f} {result["p99_ms"]:>8.2f} '
+            f'{result["queries"]:>7} {result["peak_kib"]:>8.1f}')
+
+    def write(self, path, report):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as target:
+            json.dump(report, target, ensure_ascii=False, indent=2)
+            target.write('\n')
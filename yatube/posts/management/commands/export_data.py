@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import exporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии или подписки в JSONL или CSV '
+        'потоком, пачками по id. since — включительно, until — нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=list(exporter.EXPORTS))
+        parser.add_argument('--format', choices=exporter.FORMATS,
+                            default='jsonl')
+        parser.add_argument('--output', '-o', default='-',
+                            help='Файл выгрузки, «-» — stdout.')
+        parser.add_argument('--author', help='username автора')
+        parser.add_argument('--group', help='slug группы')
+        parser.add_argument('--since', help='дата или дата и время ISO 8601')
+        parser.add_argument('--until', help='дата или дата и время ISO 8601')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        try:
+            filters = exporter.parse_filters(
+                options['author'], options['group'],
+                options['since'], options['until'])
+            export = exporter.EXPORTS[options['resource']]
+            # Фильтр, которого у выгрузки нет, — ошибка до открытия файла.
+            export.queryset(**filters)
+        except exporter.InvalidFilter as error:
+            raise CommandError(error)
+        lines = exporter.lines(export, filters, options['format'],
+                               options['batch_size'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+        total = 0
+        with open(options['output'], 'w', encoding='utf-8',
+                  newline='') as output:
+            for line in lines:
+                output.write(line)
+                total += 1
+        self.stderr.write(f'Выгружено строк: {total}')
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры картинок постов, для которых их ещё нет '
+            '(например, загруженных до появления таблицы Thumbnail).')
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').filter(
+            thumbnails__isnull=True).values_list('image', flat=True)
+        total = 0
+        for name in names.distinct().iterator():
+            thumbnails.generate_thumbnails(name)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {total}'))
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты из JSONL или CSV пачками через bulk_create. '
+        'Поля: author (username), text, group (slug), pub_date, image '
+        '(путь внутри каталога --images).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл с постами, «-» — stdin.')
+        parser.add_argument('--format', choices=importer.FORMATS,
+                            help='По умолчанию — по расширению файла.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--images', metavar='DIR',
+                            help='Каталог с картинками постов.')
+        parser.add_argument('--create-missing', action='store_true',
+                            help='Создавать неизвестных авторов и группы.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or self.guess_format(path)
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        if options['images'] and not os.path.isdir(options['images']):
+            raise CommandError(f'Нет каталога {options["images"]}.')
+        post_importer = importer.PostImporter(
+            images_dir=options['images'],
+            create_missing=options['create_missing'])
+        started = time.monotonic()
+        stream = sys.stdin if path == '-' else self.open(path)
+        try:
+            records = importer.READERS[input_format](stream)
+            for batch in importer.batches(records, options['batch_size']):
+                for line, message in post_importer.import_batch(batch):
+                    self.stderr.write(f'Строка {line}: {message}')
+                if options['verbosity'] >= 1:
+                    self.report(post_importer, started)
+        except RuntimeError as error:
+            raise CommandError(error)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано постов: {post_importer.imported}, '
+            f'пропущено: {post_importer.skipped}'))
+
+    def open(self, path):
+        try:
+            return open(path, encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть {path}: {error}')
+
+    def guess_format(self, path):
+        extension = os.path.splitext(path)[1].lstrip('.').lower()
+        if extension in importer.FORMATS:
+            return extension
+        if extension == 'json':
+            return 'jsonl'
+        raise CommandError('Не удалось определить формат, укажите --format.')
+
+    def report(self, post_importer, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'Импортировано: {post_importer.imported}, '
+            f'пропущено: {post_importer.skipped}, '
+            f'{post_importer.imported / elapsed:.0f} постов/с')
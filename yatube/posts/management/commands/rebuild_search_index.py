@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import fulltext
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс постов из posts_post.'
+
+    def handle(self, *args, **options):
+        if not fulltext.is_available():
+            raise CommandError('Полнотекстовый индекс есть только в SQLite.')
+        with transaction.atomic():
+            fulltext.rebuild()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс пересобран.'))
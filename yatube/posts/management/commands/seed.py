@@ -0,0 +1,94 @@
+import time
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import seeding
+from posts.models import Group, User
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу воспроизводимыми синтетическими данными: '
+        'пользователи, группы, посты, подписки и комментарии. Размеры — '
+        'масштаб (--scale 1: 1000 пользователей, 10 000 постов), при том '
+        'же --seed данные те же. Миниатюры картинок создаёт '
+        'generate_thumbnails.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1)
+        for name in seeding.PER_SCALE:
+            parser.add_argument(f'--{name}', type=int,
+                                help='Вместо размера по масштабу.')
+        parser.add_argument('--follows', type=float,
+                            default=seeding.FOLLOWS_PER_USER,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed',
+                            help='Начало имён пользователей и slug групп.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней до сегодня даты постов.')
+        parser.add_argument('--images', type=int, default=0,
+                            help='Сколько разных картинок создать.')
+        parser.add_argument('--image-share', type=float, default=0.2,
+                            help='Доля постов с картинкой.')
+        parser.add_argument('--password',
+                            help='Пароль пользователей; без него войти '
+                                 'под ними нельзя.')
+        parser.add_argument('--batch-size', type=int,
+                            default=seeding.BATCH_SIZE)
+        parser.add_argument('--workers', type=int, default=0,
+                            help='Процессов для вставки; 0 — в этом.')
+        parser.add_argument('--skip-rebuild', action='store_true',
+                            help='Не пересобирать счётчики, ленты и '
+                                 'поисковый индекс.')
+
+    def handle(self, *args, **options):
+        sizes = {name: options[name] for name in seeding.PER_SCALE
+                 if options[name] is not None}
+        if options['scale'] <= 0 or any(size < 0 for size in sizes.values()):
+            raise CommandError('--scale должен быть больше 0, размеры — '
+                               'не меньше 0.')
+        if options['batch_size'] < 1 or options['workers'] < 0:
+            raise CommandError('Неверные --batch-size или --workers.')
+        password = options['password'] and make_password(options['password'])
+        plan = seeding.Plan.scaled(
+            options['scale'], follows_per_user=options['follows'],
+            seed=options['seed'], prefix=options['prefix'],
+            days=options['days'], images=options['images'],
+            image_share=options['image_share'], password=password,
+            batch_size=options['batch_size'], **sizes)
+        if not plan.sizes['users'] and (plan.sizes['posts']
+                                        or plan.sizes['comments']):
+            raise CommandError('Постам нужен хотя бы один пользователь.')
+        if plan.sizes['comments'] and not plan.sizes['posts']:
+            raise CommandError('Комментариям нужен хотя бы один пост.')
+        if (User.objects.filter(username=plan.username(0)).exists()
+                or Group.objects.filter(slug=plan.slug(0)).exists()):
+            raise CommandError(
+                f'Данные с префиксом «{plan.prefix}» уже есть, '
+                f'укажите другой --prefix.')
+
+        self.started = time.monotonic()
+        self.created = Counter()
+        self.verbosity = options['verbosity']
+        seeding.seed(plan, workers=options['workers'], progress=self.progress,
+                     rebuild_derived=not options['skip_rebuild'])
+        totals = ', '.join(
+            f'{kind}: {count}' for kind, count in self.created.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано {totals} за {time.monotonic() - self.started:.1f} с'))
+        if options['skip_rebuild']:
+            self.stdout.write('Пересоберите производные данные: '
+                              'reconcile_counters, rebuild_timelines, '
+                              'rebuild_search_index.')
+
+    def progress(self, kind, count):
+        self.created[kind] += count
+        if self.verbosity >= 2:
+            elapsed = max(time.monotonic() - self.started, 1e-6)
+            self.stdout.write(
+                f'{kind}: {self.created[kind]}, '
+                f'{sum(self.created.values()) / elapsed:.0f} строк/с')
@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.core.files.storage import default_storage
 
 User = get_user_model()
 
@@ -37,10 +38,28 @@ class Post(models.Model):
         blank=True,
         help_text='Картинка для описания поста'
     )
+    updated = models.DateTimeField(auto_now=True,
+                                   verbose_name='Дата изменения')
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Post'
+        # Ключ лент (pub_date, id): общая лента, группа и профиль читают
+        # страницу по индексу, без сортировки всех записей.
+        indexes = [
+            models.Index(
+                name='post_pub_date_idx',
+                fields=['-pub_date', '-id'],
+            ),
+            models.Index(
+                name='post_group_pub_date_idx',
+                fields=['group', '-pub_date', '-id'],
+            ),
+            models.Index(
+                name='post_author_pub_date_idx',
+                fields=['author', '-pub_date', '-id'],
+            ),
+        ]
 
     def __str__(self):
         return self.text[:settings.LIMIT_SYMBOLS]
@@ -59,6 +78,14 @@ class Comment(models.Model):
                              related_name='comments',
                              verbose_name='Запись')
 
+    class Meta:
+        indexes = [
+            models.Index(
+                name='comment_post_created_idx',
+                fields=['post', 'created'],
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(User,
@@ -80,3 +107,79 @@ class Follow(models.Model):
                 check=~models.Q(user=models.F('author')),
             ),
         ]
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок: пост автора, доставленный подписчику."""
+    user = models.ForeignKey(User,
+                             on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    # Копия post.pub_date: лента читается одним диапазоном индекса.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_timeline_entry',
+                fields=['user', 'post'],
+            ),
+        ]
+        indexes = [
+            models.Index(
+                name='timeline_user_pub_date_idx',
+                fields=['user', '-pub_date', '-post'],
+            ),
+        ]
+
+
+class PulledAuthor(models.Model):
+    """
+    Автор, чьи посты не раскладываются по лентам подписчиков,
+    а подмешиваются в ленту при чтении.
+    """
+    author = models.OneToOneField(User,
+                                  on_delete=models.CASCADE,
+                                  related_name='pulled_timeline')
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаются сигналами Post и Follow."""
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                primary_key=True,
+                                related_name='stats')
+    posts_count = models.PositiveIntegerField(default=0)
+    # Подписки пользователя (user.follower) и его подписчики
+    # (user.following), как в related_name модели Follow.
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class Thumbnail(models.Model):
+    """
+    Готовая миниатюра картинки поста: страница ленты получает все
+    миниатюры одним запросом вместе с постами, без KVStore sorl.
+    """
+    post = models.ForeignKey(Post,
+                             on_delete=models.CASCADE,
+                             related_name='thumbnails')
+    geometry = models.CharField(max_length=32)
+    format = models.CharField(max_length=8)
+    name = models.CharField(max_length=255)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_thumbnail',
+                fields=['post', 'geometry', 'format'],
+            ),
+        ]
+
+    @property
+    def url(self):
+        return default_storage.url(self.name)
@@ -0,0 +1,381 @@
+import base64
+import binascii
+import hashlib
+import heapq
+import math
+from datetime import datetime
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+# id за этой границей не влезает в 64-битное целое базы.
+MAX_PK = 2 ** 63
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def pack_cursor(key, pk, number):
+    """Упаковывает ключ сортировки, id записи и номер её страницы."""
+    raw = f'{key}|{pk}|{number}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _valid_key(key):
+    """Ключ, который база сравнит без переполнения при приведении."""
+    if isinstance(key, float):
+        return math.isfinite(key)
+    if isinstance(key, datetime):
+        if timezone.is_naive(key):
+            return False
+        try:
+            key = key.astimezone(timezone.utc)
+        except OverflowError:
+            return False
+        # Запас на перевод в часовой пояс соединения.
+        return datetime.min.year < key.year < datetime.max.year
+    return key is not None
+
+
+def unpack_cursor(token, parse_key):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        key, pk, number = raw.split('|')
+        key, pk = parse_key(key), int(pk)
+        if not _valid_key(key) or not 0 < pk < MAX_PK:
+            raise InvalidCursor(token)
+        return key, pk, max(int(number), 1)
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise InvalidCursor(token)
+
+
+def encode_cursor(item, number, date_attr='pub_date'):
+    return pack_cursor(getattr(item, date_attr).isoformat(), item.pk, number)
+
+
+def decode_cursor(token):
+    return unpack_cursor(token, parse_datetime)
+
+
+class CursorPage(Page):
+    """Страница, полученная по курсору: о соседях знает без COUNT(*)."""
+
+    def __init__(self, object_list, number, paginator,
+                 has_next, has_previous):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def start_index(self):
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        return self.start_index() + len(self) - 1
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Паджинатор с кэшированным числом записей.
+
+    COUNT(*) выполняется не чаще раза в ``PAGINATOR_COUNT_TIMEOUT``
+    секунд на запрос. Оценка уточняется при каждом чтении страницы:
+    страница берётся с одной лишней записью, так что наличие следующей
+    страницы известно точно, даже если оценка устарела.
+    """
+    ELLIPSIS = '…'
+
+    @cached_property
+    def count(self):
+        key = self._count_key()
+        count = cache.get(key) if key else None
+        if count is None:
+            count = super().count
+            if key:
+                cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+        return count
+
+    def validate_number(self, number):
+        # Верхнюю границу не проверяем: оценка может отставать,
+        # пустую страницу обнаружит page().
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        items = self._fetch(bottom, self.per_page + 1)
+        if not items and number > 1:
+            self._correct_count(min(self.count, bottom))
+            raise EmptyPage('That page contains no results')
+        if len(items) > self.per_page:
+            if self.count <= bottom + self.per_page:
+                self._correct_count(bottom + self.per_page + 1)
+        else:
+            self._correct_count(bottom + len(items))
+        object_list = self._object_list(items[:self.per_page], bottom)
+        return self._get_page(object_list, number, self)
+
+    def get_page(self, number):
+        try:
+            return super().get_page(number)
+        except EmptyPage:
+            # Пуста и последняя страница по оценке: записи удалялись
+            # быстрее, чем она устаревает. Считаем заново.
+            self._recount()
+        try:
+            return self.page(self.num_pages)
+        except EmptyPage:
+            return self.page(1)
+
+    def get_elided_page_range(self, number=1, on_each_side=3, on_ends=2):
+        """
+        Номера страниц вокруг текущей и по краям, пропуски — ELLIPSIS.
+        Размер не зависит от числа страниц.
+        """
+        number = min(self.validate_number(number), self.num_pages)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1,
+                             self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def _fetch(self, offset, limit):
+        return list(self.object_list[offset:offset + limit])
+
+    def _object_list(self, items, offset):
+        # QuerySet с уже заполненным кэшем: шаблоны и тесты работают
+        # с object_list как с QuerySet, повторного запроса при этом нет.
+        object_list = self.object_list[offset:offset + len(items)]
+        object_list._result_cache = items
+        return object_list
+
+    def _count_key(self):
+        try:
+            sql, params = self.object_list.query.sql_with_params()
+        except (AttributeError, EmptyResultSet):
+            return None
+        digest = hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+        return f'paginator:count:{digest}'
+
+    def _recount(self):
+        key = self._count_key()
+        if key:
+            cache.delete(key)
+        self.__dict__.pop('count', None)
+        self.__dict__.pop('num_pages', None)
+
+    def _correct_count(self, count):
+        if count == self.count:
+            return
+        self.__dict__['count'] = count
+        self.__dict__.pop('num_pages', None)
+        key = self._count_key()
+        if key:
+            cache.set(key, count, settings.PAGINATOR_COUNT_TIMEOUT)
+
+
+class CursorPaginator(CachedCountPaginator):
+    """
+    Паджинатор ленты по ключу (pub_date, id) вместо LIMIT/OFFSET.
+
+    ``lookups`` — поля запроса, по которым идёт сортировка; они должны
+    совпадать со значениями ``date_attr`` и ``pk`` самих записей.
+    ``oldest_first`` разворачивает ленту: сначала старые записи.
+    Страницы по номеру (?page=) по-прежнему отдаются обычным ``Page``,
+    но и они получают курсоры ``next_cursor``/``previous_cursor``.
+    """
+
+    def __init__(self, object_list, per_page, lookups=('pub_date', 'pk'),
+                 date_attr='pub_date', oldest_first=False, **kwargs):
+        self.lookups = lookups
+        self.date_attr = date_attr
+        self.oldest_first = oldest_first
+        super().__init__(self._ordered(object_list), per_page, **kwargs)
+
+    def page(self, number):
+        page = super().page(number)
+        self._attach_cursors(page, list(page.object_list))
+        return page
+
+    def page_after(self, token):
+        pub_date, pk, number = self.decode_cursor(token)
+        items = self._fetch_after(pub_date, pk, self.per_page + 1)
+        has_next = len(items) > self.per_page
+        return self._cursor_page(
+            items[:self.per_page], number + 1,
+            has_next=has_next, has_previous=True)
+
+    def page_before(self, token):
+        pub_date, pk, number = self.decode_cursor(token)
+        items = self._fetch_before(pub_date, pk, self.per_page + 1)
+        if not items:
+            return self.page(1)
+        has_previous = len(items) > self.per_page
+        items = items[:self.per_page][::-1]
+        number = number - 1 if has_previous else 1
+        return self._cursor_page(
+            items, max(number, 1),
+            has_next=True, has_previous=has_previous)
+
+    def get_cursor_page(self, after=None, before=None, number=None):
+        """Как ``get_page``, но сперва пробует курсоры ?after=/?before=."""
+        try:
+            if after:
+                return self.page_after(after)
+            if before:
+                return self.page_before(before)
+        except InvalidCursor:
+            pass
+        return self.get_page(number)
+
+    def encode_cursor(self, item, number):
+        return encode_cursor(item, number, self.date_attr)
+
+    def decode_cursor(self, token):
+        return decode_cursor(token)
+
+    def _ordered(self, object_list):
+        desc = '' if self.oldest_first else '-'
+        date_lookup, pk_lookup = self.lookups
+        return object_list.order_by(f'{desc}{date_lookup}',
+                                    f'{desc}{pk_lookup}')
+
+    def _beyond(self, pub_date, pk, forward):
+        """Записи за ключом по ходу ленты (forward) или против него."""
+        op = 'gt' if forward == self.oldest_first else 'lt'
+        date_lookup, pk_lookup = self.lookups
+        return self.object_list.filter(
+            Q(**{f'{date_lookup}__{op}': pub_date})
+            | Q(**{date_lookup: pub_date, f'{pk_lookup}__{op}': pk}),
+            # Избыточное условие по одной дате даёт SQLite границу
+            # диапазона в индексе: без него OR читает индекс с начала.
+            **{f'{date_lookup}__{op}e': pub_date},
+        )
+
+    def _fetch_after(self, pub_date, pk, limit):
+        """Записи за ключом в порядке ленты."""
+        return list(self._beyond(pub_date, pk, forward=True)[:limit])
+
+    def _fetch_before(self, pub_date, pk, limit):
+        """Записи перед ключом, от ближайшей к ключу."""
+        queryset = self._beyond(pub_date, pk, forward=False)
+        return list(queryset.reverse()[:limit])
+
+    def _cursor_page(self, items, number, has_next, has_previous):
+        page = CursorPage(self._object_list(items), number, self,
+                          has_next=has_next, has_previous=has_previous)
+        self._attach_cursors(page, items)
+        return page
+
+    def _object_list(self, items, offset=None):
+        if offset is not None:
+            return super()._object_list(items, offset)
+        object_list = self.object_list.filter(
+            pk__in=[item.pk for item in items])
+        object_list._result_cache = items
+        return object_list
+
+    def _attach_cursors(self, page, items):
+        page.elided_page_range = list(
+            self.get_elided_page_range(page.number))
+        page.next_cursor = None
+        page.previous_cursor = None
+        if items and page.has_next():
+            page.next_cursor = self.encode_cursor(items[-1], page.number)
+        if items and page.has_previous():
+            page.previous_cursor = self.encode_cursor(items[0], page.number)
+
+
+def sort_key(item):
+    return item.pub_date, item.pk
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """
+    Слияние нескольких непересекающихся лент по ключу (pub_date, id).
+
+    ``sources`` — пары (queryset, lookups). Каждый источник читается
+    по своему индексу и отдаёт не больше записей, чем нужно странице,
+    общий порядок собирается через heapq.merge.
+    """
+
+    def __init__(self, sources, per_page, **kwargs):
+        self.sources = [
+            CursorPaginator(queryset, per_page, lookups=lookups)
+            for queryset, lookups in sources
+        ]
+        super().__init__(self.sources, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        return sum(source.count for source in self.sources)
+
+    def _ordered(self, object_list):
+        return object_list
+
+    def _count_key(self):
+        return None
+
+    def _fetch(self, offset, limit):
+        merged = heapq.merge(
+            *(source._fetch(0, offset + limit) for source in self.sources),
+            key=sort_key, reverse=True)
+        return list(islice(merged, offset, offset + limit))
+
+    def _fetch_after(self, pub_date, pk, limit):
+        merged = heapq.merge(
+            *(source._fetch_after(pub_date, pk, limit)
+              for source in self.sources),
+            key=sort_key, reverse=True)
+        return list(islice(merged, limit))
+
+    def _fetch_before(self, pub_date, pk, limit):
+        merged = heapq.merge(
+            *(source._fetch_before(pub_date, pk, limit)
+              for source in self.sources),
+            key=sort_key)
+        return list(islice(merged, limit))
+
+    def _object_list(self, items, offset=None):
+        model = self.sources[0].object_list.model
+        object_list = model._default_manager.filter(
+            pk__in=[item.pk for item in items])
+        object_list._result_cache = items
+        return object_list
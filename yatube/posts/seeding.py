@@ -0,0 +1,355 @@
+"""
+Воспроизводимые синтетические данные (команда seed, замеры страниц).
+
+Создаются пользователи, группы, посты, подписки и комментарии.
+Распределения похожи на живые: активность авторов и популярность
+групп — по закону Ципфа, длина текста — логнормальная (много коротких
+постов, редкие длинные), число подписок пользователя — по Парето,
+а на кого подписываться — снова по Ципфу, так что у немногих авторов
+большинство подписчиков. Даты постов растут вместе с id, как в живой
+базе; комментарий появляется после своего поста.
+
+Строки делятся на блоки по ``BLOCK_SIZE``, и у каждого блока свой
+генератор случайных чисел из seed, вида данных и номера блока. Поэтому
+при том же seed данные одинаковы при любом размере пачки и числе
+процессов. id пользователей, групп и постов задаются явно, начиная
+за текущим максимумом: посты и комментарии ссылаются на них без
+запросов, а пачки можно вставлять параллельно в нескольких процессах
+(fork), каждая — bulk_create в своей транзакции.
+
+bulk_create обходит сигналы, поэтому счётчики, ленты подписок
+и поисковый индекс после вставки пересобираются (``rebuild``).
+"""
+import math
+import random
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+from multiprocessing import get_context
+
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from . import counters, fragments, fulltext, timelines
+from .models import Comment, Follow, Group, Post, User
+
+# Строк на единицу масштаба; 1000 — около 10 млн постов.
+PER_SCALE = {'users': 1000, 'groups': 20, 'posts': 10000, 'comments': 30000}
+FOLLOWS_PER_USER = 20
+BLOCK_SIZE = 1000
+BATCH_SIZE = 5000
+# Показатели распределений.
+ZIPF_EXPONENT = 1.0
+FOLLOWS_PARETO_ALPHA = 2.0
+POST_WORDS_MEDIAN = 30
+COMMENT_WORDS_MEDIAN = 8
+WORDS_SIGMA = 1.0
+MAX_WORDS = 2000
+GROUP_SHARE = 0.7
+COMMENT_DELAY_HOURS = 6
+IMAGE_SIZE = (640, 480)
+
+FIRST_NAMES = ('Анна', 'Борис', 'Вера', 'Глеб', 'Дарья', 'Егор', 'Жанна',
+               'Иван', 'Ксения', 'Лев', 'Мария', 'Никита', 'Ольга', 'Пётр')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов',
+              'Лебедев', 'Козлов', 'Новиков', 'Морозов', 'Волков')
+WORDS = ('пост', 'лента', 'группа', 'автор', 'день', 'город', 'книга',
+         'фото', 'утро', 'вечер', 'новость', 'мысль', 'заметка', 'дорога',
+         'море', 'поезд', 'кофе', 'работа', 'дом', 'друг', 'музыка', 'кино',
+         'лето', 'зима', 'снег', 'дождь', 'парк', 'собака', 'кот', 'сад',
+         'проект', 'код', 'встреча', 'выставка', 'река', 'лес', 'праздник',
+         'идея', 'вопрос', 'ответ', 'история', 'рецепт', 'путь', 'свет')
+PHASES = (('users', 'groups'), ('posts', 'follows'), ('comments',))
+MODELS = {'users': User, 'groups': Group, 'posts': Post,
+          'follows': Follow, 'comments': Comment}
+
+_plan = None
+
+
+class Plan:
+    """
+    Что создать: сколько строк каждого вида, seed и оформление. Пустые
+    id-базы (``*_base``) заполняет ``seed`` по текущему максимуму.
+    """
+
+    def __init__(self, users, groups, posts, comments,
+                 follows_per_user=FOLLOWS_PER_USER, seed=0, prefix='seed',
+                 days=365, images=0, image_share=0.2, password=None,
+                 batch_size=BATCH_SIZE, now=None):
+        self.sizes = {'users': users, 'groups': groups, 'posts': posts,
+                      'follows': users, 'comments': comments}
+        self.follows_per_user = follows_per_user
+        self.seed = seed
+        self.prefix = prefix
+        self.image_count = images
+        self.image_share = image_share
+        self.images = []
+        self.password = password or UNUSABLE_PASSWORD_PREFIX + 'seed'
+        self.batch_size = batch_size
+        # Опорное время — начало дня, чтобы повтор в тот же день совпал.
+        self.now = now or timezone.now().replace(
+            hour=0, minute=0, second=0, microsecond=0)
+        self.start = self.now - timedelta(days=days)
+        self.user_base = self.group_base = self.post_base = None
+        self.user_weights = zipf_weights(users)
+        self.group_weights = zipf_weights(groups)
+
+    @classmethod
+    def scaled(cls, scale, **kwargs):
+        """План масштаба ``scale``; явные размеры в kwargs важнее."""
+        sizes = {name: max(1, round(count * scale))
+                 for name, count in PER_SCALE.items()}
+        sizes.update(kwargs)
+        return cls(**sizes)
+
+    def rng(self, kind, block):
+        return random.Random(f'{self.seed}:{kind}:{block}')
+
+    def username(self, index):
+        return f'{self.prefix}{index}'
+
+    def slug(self, index):
+        return f'{self.prefix}-group{index}'
+
+    def post_date(self, index):
+        span = self.now - self.start
+        return self.start + span * (index + 1) / self.sizes['posts']
+
+    def tasks(self, kinds):
+        """Пачки ``(вид, начало, конец)``, выровненные по блокам."""
+        step = max(1, math.ceil(self.batch_size / BLOCK_SIZE)) * BLOCK_SIZE
+        for kind in kinds:
+            total = self.sizes[kind]
+            for start in range(0, total, step):
+                yield kind, start, min(start + step, total)
+
+
+def zipf_weights(count):
+    """Накопленные веса рангов по Ципфу для random.choices."""
+    return list(accumulate(
+        1 / (rank + 1) ** ZIPF_EXPONENT for rank in range(count)))
+
+
+def random_text(rng, median=POST_WORDS_MEDIAN):
+    """Текст логнормальной длины в словах, разбитый на предложения."""
+    length = int(rng.lognormvariate(math.log(median), WORDS_SIGMA))
+    length = max(1, min(MAX_WORDS, length))
+    sentences = []
+    while length > 0:
+        size = min(length, rng.randint(4, 14))
+        words = ' '.join(rng.choices(WORDS, k=size))
+        sentences.append(words.capitalize() + '.')
+        length -= size
+    return ' '.join(sentences)
+
+
+def user_rows(plan, rng, start, stop):
+    return [User(id=plan.user_base + index, username=plan.username(index),
+                 first_name=rng.choice(FIRST_NAMES),
+                 last_name=rng.choice(LAST_NAMES),
+                 password=plan.password, date_joined=plan.start)
+            for index in range(start, stop)]
+
+
+def group_rows(plan, rng, start, stop):
+    return [Group(id=plan.group_base + index,
+                  title=f'{rng.choice(WORDS).capitalize()} {index}',
+                  slug=plan.slug(index),
+                  description=random_text(rng, COMMENT_WORDS_MEDIAN))
+            for index in range(start, stop)]
+
+
+def post_rows(plan, rng, start, stop):
+    authors = rng.choices(range(plan.sizes['users']),
+                          cum_weights=plan.user_weights, k=stop - start)
+    rows = []
+    for index, author in zip(range(start, stop), authors):
+        group_id = None
+        if plan.group_weights and rng.random() < GROUP_SHARE:
+            group_id = plan.group_base + bisect(
+                plan.group_weights, rng.random() * plan.group_weights[-1])
+        image = ''
+        if plan.images and rng.random() < plan.image_share:
+            image = rng.choice(plan.images)
+        pub_date = plan.post_date(index)
+        rows.append(Post(id=plan.post_base + index,
+                         author_id=plan.user_base + author,
+                         group_id=group_id, text=random_text(rng),
+                         image=image, pub_date=pub_date, updated=pub_date))
+    return rows
+
+
+def follow_rows(plan, rng, start, stop):
+    users = plan.sizes['users']
+    # Среднее Парето — alpha / (alpha - 1), приводим его к нужному.
+    alpha = FOLLOWS_PARETO_ALPHA
+    mean = plan.follows_per_user * (alpha - 1) / alpha
+    limit = (users - 1) // 2
+    rows = []
+    for index in range(start, stop):
+        count = min(limit, int(mean * rng.paretovariate(alpha)))
+        authors = set()
+        # Популярных выбирают чаще, повторы и себя отбрасываем.
+        for _ in range(10):
+            if len(authors) >= count:
+                break
+            authors.update(rng.choices(range(users),
+                                       cum_weights=plan.user_weights,
+                                       k=count - len(authors)))
+            authors.discard(index)
+        rows.extend(Follow(user_id=plan.user_base + index,
+                           author_id=plan.user_base + author)
+                    for author in sorted(authors))
+    return rows
+
+
+def comment_rows(plan, rng, start, stop):
+    posts = plan.sizes['posts']
+    authors = rng.choices(range(plan.sizes['users']),
+                          cum_weights=plan.user_weights, k=stop - start)
+    rows = []
+    for author in authors:
+        post = rng.randrange(posts)
+        created = min(plan.now, plan.post_date(post) + timedelta(
+            hours=rng.expovariate(1 / COMMENT_DELAY_HOURS)))
+        rows.append(Comment(post_id=plan.post_base + post,
+                            author_id=plan.user_base + author,
+                            text=random_text(rng, COMMENT_WORDS_MEDIAN),
+                            created=created))
+    return rows
+
+
+ROW_BUILDERS = {'users': user_rows, 'groups': group_rows, 'posts': post_rows,
+                'follows': follow_rows, 'comments': comment_rows}
+
+
+def build_rows(plan, kind, start, stop):
+    rows = []
+    for block_start in range(start, stop, BLOCK_SIZE):
+        rng = plan.rng(kind, block_start // BLOCK_SIZE)
+        rows.extend(ROW_BUILDERS[kind](
+            plan, rng, block_start, min(block_start + BLOCK_SIZE, stop)))
+    return rows
+
+
+def insert_task(plan, task):
+    """Вставляет одну пачку; возвращает (вид, число строк)."""
+    kind, start, stop = task
+    rows = build_rows(plan, kind, start, stop)
+    with transaction.atomic():
+        MODELS[kind].objects.bulk_create(rows)
+    return kind, len(rows)
+
+
+@contextmanager
+def explicit_dates():
+    """Отключает auto_now и auto_now_add: даты задаются генератором."""
+    fields = [Post._meta.get_field('pub_date'),
+              Post._meta.get_field('updated'),
+              Comment._meta.get_field('created')]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def make_images(plan):
+    """Картинки, общие для постов плана; одинаковы при том же seed."""
+    field = Post._meta.get_field('image')
+    names = []
+    for index in range(plan.image_count):
+        name = field.generate_filename(
+            None, f'{plan.prefix}-{plan.seed}-{index}.jpg')
+        if not default_storage.exists(name):
+            rng = plan.rng('images', index)
+            image = Image.new('RGB', IMAGE_SIZE, tuple(
+                rng.randrange(256) for _ in range(3)))
+            draw = ImageDraw.Draw(image)
+            for _ in range(8):
+                x, y = (rng.randrange(IMAGE_SIZE[0]),
+                        rng.randrange(IMAGE_SIZE[1]))
+                draw.ellipse((x, y, x + rng.randrange(40, 200),
+                              y + rng.randrange(40, 200)),
+                             fill=tuple(rng.randrange(256) for _ in range(3)))
+            content = BytesIO()
+            image.save(content, 'JPEG', quality=85)
+            name = default_storage.save(name, ContentFile(content.getvalue()))
+        names.append(name)
+    return names
+
+
+def _init_worker(plan):
+    # Как у миниатюр: соединения родителя не закрываем, открываем свои.
+    global _plan
+    _plan = plan
+    for worker_connection in connections.all():
+        worker_connection.connection = None
+
+
+def _insert_in_worker(task):
+    if connection.vendor == 'sqlite':
+        # Писатель в SQLite один: остальные процессы ждут блокировку.
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout = 60000')
+    return insert_task(_plan, task)
+
+
+def seed(plan, workers=0, progress=None, rebuild_derived=True):
+    """
+    Создаёт данные плана; ``workers`` > 0 — в стольких процессах.
+    ``progress(вид, строк)`` вызывается после каждой пачки.
+    """
+    plan.user_base = (User.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    plan.group_base = (
+        Group.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    plan.post_base = (Post.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+    plan.images = make_images(plan)
+    # Процессы создаются внутри explicit_dates: при fork они наследуют
+    # отключённые auto_now.
+    with explicit_dates():
+        pool = None
+        if workers:
+            pool = get_context('fork').Pool(
+                workers, initializer=_init_worker, initargs=(plan,))
+        try:
+            for kinds in PHASES:
+                tasks = plan.tasks(kinds)
+                if pool is None:
+                    done = (insert_task(plan, task) for task in tasks)
+                else:
+                    done = pool.imap_unordered(_insert_in_worker, tasks)
+                for kind, count in done:
+                    if progress is not None:
+                        progress(kind, count)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    # id заданы явно: последовательности (PostgreSQL) отстали.
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(
+                no_style(), [User, Group, Post]):
+            cursor.execute(sql)
+    if rebuild_derived:
+        rebuild()
+
+
+def rebuild():
+    """Пересобирает то, что при обычной записи ведут сигналы."""
+    counters.reconcile()
+    timelines.rebuild()
+    if fulltext.is_available():
+        fulltext.rebuild()
+    fragments.bump(fragments.POSTS_VERSION_KEY)
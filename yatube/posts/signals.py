@@ -0,0 +1,85 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import counters, fragments, fulltext, timelines
+from .models import Follow, Group, Post, User
+
+# Поля пользователя, которые видны в закэшированных лентах.
+AUTHOR_DISPLAY_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        timelines.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timelines.backfill(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def purge_timeline(sender, instance, **kwargs):
+    timelines.purge(instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    counters.bump(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.user_id, 'follower_count', 1)
+        counters.bump(instance.author_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    counters.bump(instance.user_id, 'follower_count', -1)
+    counters.bump(instance.author_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def index_post_text(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        fulltext.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post_text(sender, instance, **kwargs):
+    fulltext.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+# Название группы есть в лентах RSS/Atom и в ключе их кэша не участвует
+@receiver(post_save, sender=Group)
+def invalidate_feeds(sender, **kwargs):
+    fragments.bump(fragments.POSTS_VERSION_KEY)
+
+
+@receiver(post_save, sender=User)
+def invalidate_feeds_on_rename(sender, created, update_fields=None,
+                               **kwargs):
+    # Вход сохраняет только last_login: ленты от этого не меняются.
+    if created or (update_fields is not None
+                   and not AUTHOR_DISPLAY_FIELDS & set(update_fields)):
+        return
+    fragments.bump(fragments.POSTS_VERSION_KEY)
+    fragments.bump(fragments.AUTHORS_VERSION_KEY)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def invalidate_follow_feed(sender, instance, **kwargs):
+    fragments.bump(fragments.follows_version_key(instance.user_id))
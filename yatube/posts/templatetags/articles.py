@@ -0,0 +1,15 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import fragments, thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def article_blocks(posts, PRINT_GROUP_LINK=False, PRINT_AUTHOR_LINK=False):
+    return [
+        mark_safe(html) for html in fragments.render_articles(
+            posts, PRINT_GROUP_LINK, PRINT_AUTHOR_LINK,
+            prepare=thumbnails.prefetch)
+    ]
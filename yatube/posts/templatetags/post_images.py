@@ -0,0 +1,40 @@
+from django import template
+from django.conf import settings
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/picture.html')
+def post_picture(post):
+    """
+    <picture> картинки поста: варианты AVIF/WebP через srcset и основная
+    миниатюра для старых браузеров. Миниатюры берутся из post.thumbnails
+    (в лентах подгружены для всей страницы). Формат без полного набора
+    вариантов пропускается.
+    """
+    found = thumbnails.thumbnail_map(post)
+    geometry, options = settings.THUMBNAIL_GEOMETRIES[0]
+    width, height = map(int, geometry.split('x'))
+    srcsets = {}
+    for image_format, variant_width, variant_geometry, _ in (
+            thumbnails.variant_geometries()):
+        variant = found.get((variant_geometry, image_format))
+        srcset = srcsets.setdefault(image_format, [])
+        if variant is None or srcset is None:
+            srcsets[image_format] = None
+            continue
+        srcset.append(f'{variant.url} {variant_width}w')
+    fallback = found.get((geometry, thumbnails.image_format(options)))
+    return {
+        'sources': [
+            {'type': f'image/{image_format.lower()}',
+             'srcset': ', '.join(srcset)}
+            for image_format, srcset in srcsets.items() if srcset
+        ],
+        'sizes': settings.POST_IMAGE_SIZES,
+        'src': (fallback or thumbnails.Placeholder(geometry)).url,
+        'width': width,
+        'height': height,
+    }
@@ -0,0 +1,111 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import benchmarks
+from ..models import Comment, Follow, Post, TimelineEntry, UserStats
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.dataset = benchmarks.populate(1, seed=7)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_populate_sizes_and_derived_data(self):
+        sizes = benchmarks.PER_SCALE
+        self.assertEqual(Post.objects.count(), sizes['posts'])
+        self.assertEqual(Comment.objects.count(), sizes['comments'])
+        self.assertEqual(
+            Follow.objects.filter(user=self.dataset.reader).count(),
+            benchmarks.READER_FOLLOWS)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.dataset.reader).exists())
+        author = self.dataset.author
+        self.assertEqual(UserStats.objects.get(user=author).posts_count,
+                         Post.objects.filter(author=author).count())
+        self.assertEqual(self.dataset.post.author, author)
+
+    def test_view_urls_are_read_only_pages(self):
+        urls = dict(benchmarks.view_urls(self.dataset))
+        self.assertEqual(set(urls), set(benchmarks.VIEWS))
+        for name in ('posts:profile_follow', 'posts:profile_unfollow',
+                     'posts:add_comment', 'users:logout'):
+            self.assertNotIn(name, urls)
+        self.assertEqual(
+            urls['posts:post_detail'],
+            reverse('posts:post_detail',
+                    kwargs={'post_id': self.dataset.post.pk}))
+
+    def test_view_urls_do_not_change_data(self):
+        """Каждая страница под своей ролью отвечает сама, без редиректа."""
+        def counts():
+            return [model.objects.count() for model in (
+                Post, Comment, Follow, TimelineEntry)]
+
+        before = counts()
+        for name, path in benchmarks.view_urls(self.dataset):
+            role = benchmarks.url_role(name, 'user')
+            client = Client()
+            client.force_login(self.dataset.login(role))
+            with self.subTest(url=name, role=role):
+                self.assertEqual(client.get(path).status_code, 200)
+        self.assertEqual(counts(), before)
+
+    def test_measure(self):
+        path = reverse('posts:profile',
+                       kwargs={'username': self.dataset.author.username})
+        result = benchmarks.measure(Client(), path, repeat=3,
+                                    login=self.dataset.reader)
+        self.assertEqual(result['status'], 200)
+        self.assertGreater(result['queries'], 0)
+        self.assertGreater(result['peak_kib'], 0)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_compare(self):
+        old = {'scale': 1, 'role': 'user', 'url': 'posts:index',
+               'queries': 5, 'p50_ms': 10.0, 'p90_ms': 12.0,
+               'peak_kib': 100.0}
+        self.assertEqual(benchmarks.compare(
+            [{**old, 'p50_ms': 15.5, 'peak_kib': 200.0}], [old], 0.5), [])
+        regressions = benchmarks.compare(
+            [{**old, 'queries': 6, 'p50_ms': 20.0, 'p90_ms': 50.0}],
+            [old], 0.5)
+        self.assertEqual(len(regressions), 2)
+        self.assertIn('SQL-запросов 5 -> 6', regressions[0])
+        self.assertIn('p50_ms 10.0 -> 20.0', regressions[1])
+        self.assertEqual(benchmarks.compare(
+            [{**old, 'url': 'posts:new'}], [old], 0.5), [])
+        # В другом окружении сравниваются только SQL-запросы.
+        regressions = benchmarks.compare(
+            [{**old, 'queries': 6, 'p50_ms': 90.0, 'peak_kib': 900.0}],
+            [old], 0.5, timings=False)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('SQL-запросов 5 -> 6', regressions[0])
+
+    def test_same_environment(self):
+        report = benchmarks.environment()
+        self.assertTrue(benchmarks.same_environment(report, dict(report)))
+        for key in ('python', 'machine'):
+            with self.subTest(key=key):
+                self.assertFalse(benchmarks.same_environment(
+                    report, {**report, key: 'other'}))
+        self.assertFalse(benchmarks.same_environment(
+            report, {'python': report['python']}))
+
+    def test_search_and_staff_pages_measure_real_work(self):
+        urls = dict(benchmarks.view_urls(self.dataset))
+        client = Client()
+        response = client.get(urls['posts:search'])
+        self.assertEqual(response.context['query'], benchmarks.URL_QUERIES[
+            'posts:search']['q'])
+        self.assertTrue(response.context['page_obj'].object_list)
+        self.assertEqual(
+            benchmarks.url_role('posts:export_data', 'user'), 'staff')
+        result = benchmarks.measure(Client(), urls['posts:export_data'],
+                                    repeat=1, login=self.dataset.staff)
+        self.assertEqual(result['status'], 200)
+        self.assertGreater(result['queries'], 0)
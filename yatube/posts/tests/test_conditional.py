@@ -0,0 +1,142 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+        counters.get_stats(cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.author)
+
+    def urls(self):
+        return (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+
+    def assertNotModified(self, url, etag, client=None):
+        response = (client or self.guest_client).get(
+            url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304, url)
+
+    def assertModified(self, url, etag, client=None):
+        response = (client or self.guest_client).get(
+            url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200, url)
+
+    def etags(self, client=None):
+        return {url: (client or self.guest_client).get(url)['ETag']
+                for url in self.urls()}
+
+    def test_unchanged_pages_are_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304 без тела."""
+        for url, etag in self.etags().items():
+            with self.subTest(url=url):
+                self.assertNotModified(url, etag)
+
+    def test_new_post_changes_feeds(self):
+        """Новый пост меняет ETag ленты, группы и профиля."""
+        etags = self.etags()
+        Post.objects.create(author=self.author, group=self.group, text='Ещё')
+        for url in self.urls()[:3]:
+            with self.subTest(url=url):
+                self.assertModified(url, etags[url])
+
+    def test_edited_post_changes_pages(self):
+        """Правка поста меняет ETag всех страниц, где он показан."""
+        etags = self.etags()
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный пост'
+        post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertModified(url, etag)
+
+    def test_new_comment_changes_post_detail(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        url = self.urls()[3]
+        etag = self.guest_client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.author, text='Комментарий')
+        self.assertModified(url, etag)
+
+    def test_group_description_changes_group_page(self):
+        """Шапка группы входит в ETag её страницы."""
+        url = self.urls()[1]
+        etag = self.guest_client.get(url)['ETag']
+        Group.objects.filter(pk=self.group.pk).update(description='Новое')
+        self.assertModified(url, etag)
+
+    def test_author_rename_changes_pages(self):
+        """Новое имя автора или комментатора меняет ETag его страниц."""
+        commenter = User.objects.create_user(username='commenter')
+        Comment.objects.create(
+            post=self.post, author=commenter, text='Комментарий')
+        etags = self.etags()
+        self.author.first_name = 'Новое'
+        self.author.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                self.assertModified(url, etag)
+        url = self.urls()[3]
+        etag = self.guest_client.get(url)['ETag']
+        commenter.last_name = 'Имя'
+        commenter.save(update_fields=['last_name'])
+        self.assertModified(url, etag)
+        # Вход меняет только last_login: ETag прежний.
+        etag = self.guest_client.get(url)['ETag']
+        self.client.force_login(commenter)
+        self.assertNotModified(url, etag)
+
+    def test_etag_depends_on_user_and_query(self):
+        """Гость, пользователь и разные страницы получают разные ETag."""
+        guest = self.etags()
+        authorized = self.etags(self.authorized_client)
+        for url in self.urls():
+            with self.subTest(url=url):
+                self.assertNotEqual(guest[url], authorized[url])
+                self.assertModified(url, guest[url], self.authorized_client)
+        url = reverse('posts:index')
+        self.assertNotEqual(
+            self.guest_client.get(url)['ETag'],
+            self.guest_client.get(url, {'page': 2})['ETag'])
+
+    def test_no_etag_before_stats_exist(self):
+        """Пока нет строки счётчиков, профиль отдаётся без ETag."""
+        user = User.objects.create_user(username='newcomer')
+        url = reverse('posts:profile', kwargs={'username': user.username})
+        self.assertFalse(self.guest_client.get(url).has_header('ETag'))
+        self.assertTrue(self.guest_client.get(url).has_header('ETag'))
+
+    def test_missing_objects_are_not_found(self):
+        """Без объекта ETag не считается, view отвечает 404."""
+        for url in (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        ):
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH='"x"')
+                self.assertEqual(response.status_code, 404)
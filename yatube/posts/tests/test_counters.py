@@ -0,0 +1,70 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import counters
+from ..models import Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class UserStatsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def create_stats(self, *users):
+        for user in users:
+            counters.get_stats(User.objects.get(pk=user.pk))
+
+    def test_stats_created_lazily_with_actual_counts(self):
+        """Строка счётчиков создаётся при первом чтении пересчётом."""
+        self.assertFalse(UserStats.objects.exists())
+        response = self.guest_client.get(
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}))
+        self.assertEqual(response.context['stats'].posts_count, 1)
+
+    def test_signals_keep_counters_current(self):
+        """Создание и удаление Post и Follow меняют счётчики."""
+        self.create_stats(self.user, self.author)
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Ещё пост')
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.assertEqual(self.stats(self.author).following_count, 1)
+        self.assertEqual(self.stats(self.user).follower_count, 1)
+        post.delete()
+        follow.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).following_count, 0)
+        self.assertEqual(self.stats(self.user).follower_count, 0)
+
+    def test_post_detail_reads_stats_with_post(self):
+        """post_detail не считает посты автора отдельным COUNT."""
+        self.create_stats(self.author)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.guest_client.get(url)
+        # ETag, пост с автором и счётчиками, комментарии
+        with self.assertNumQueries(3):
+            response = self.guest_client.get(url)
+        self.assertContains(response, 'Всего постов автора:  <span >1')
+
+    def test_reconcile_counters_command(self):
+        """reconcile_counters чинит расхождения."""
+        self.create_stats(self.author)
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        call_command('reconcile_counters', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.user).posts_count, 0)
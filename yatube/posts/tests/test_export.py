@@ -0,0 +1,156 @@
+import csv
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+from http import HTTPStatus
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import exporter
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        start = timezone.make_aware(datetime(2020, 1, 1))
+        for index in range(5):
+            post = Post.objects.create(
+                author=cls.author if index % 2 else cls.reader,
+                group=cls.group if index < 3 else None,
+                text=f'Пост {index}')
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=start + timedelta(days=index))
+        cls.post = Post.objects.get(text='Пост 0')
+        Comment.objects.create(post=cls.post, author=cls.author, text='Ок')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def export(self, resource, batch_size=1000, output_format='jsonl',
+               **filters):
+        return ''.join(exporter.lines(
+            exporter.EXPORTS[resource], exporter.parse_filters(**filters),
+            output_format, batch_size))
+
+    def test_keyset_batches_cover_table_once(self):
+        """Пачки по id отдают каждую строку ровно один раз, по порядку."""
+        for batch_size in (1, 2, 5, 100):
+            with self.subTest(batch_size=batch_size):
+                records = [json.loads(line) for line in self.export(
+                    'posts', batch_size=batch_size).splitlines()]
+                self.assertEqual(
+                    [record['id'] for record in records],
+                    list(Post.objects.order_by('pk').values_list(
+                        'pk', flat=True)))
+
+    def test_batches_use_constant_queries(self):
+        """Каждая пачка — один запрос с LIMIT, без OFFSET и COUNT."""
+        with self.assertNumQueries(3):
+            self.export('posts', batch_size=2)
+
+    def test_post_record_matches_import_format(self):
+        record = json.loads(self.export('posts').splitlines()[0])
+        self.assertEqual(record, {
+            'id': self.post.pk,
+            'author': 'reader',
+            'group': 'group',
+            'pub_date': '2020-01-01T00:00:00Z',
+            'text': 'Пост 0',
+            'image': '',
+        })
+
+    def test_filters(self):
+        def texts(**filters):
+            return [json.loads(line)['text']
+                    for line in self.export('posts', **filters).splitlines()]
+
+        self.assertEqual(texts(author='author'), ['Пост 1', 'Пост 3'])
+        self.assertEqual(texts(group='group'), ['Пост 0', 'Пост 1', 'Пост 2'])
+        self.assertEqual(texts(since='2020-01-02', until='2020-01-04'),
+                         ['Пост 1', 'Пост 2'])
+
+    def test_comments_and_follows(self):
+        comment = json.loads(self.export('comments', group='group'))
+        self.assertEqual(
+            (comment['post'], comment['author'], comment['text']),
+            (self.post.pk, 'author', 'Ок'))
+        follow = json.loads(self.export('follows'))
+        self.assertEqual((follow['user'], follow['author']),
+                         ('reader', 'author'))
+
+    def test_invalid_filters(self):
+        for resource, filters in (
+            ('follows', {'since': '2020-01-01'}),
+            ('follows', {'group': 'group'}),
+            ('posts', {'since': 'вчера'}),
+            ('posts', {'since': '2020-02-30'}),
+            ('posts', {'since': '2020-01-02', 'until': '2020-01-01'}),
+        ):
+            with self.subTest(resource=resource, filters=filters):
+                with self.assertRaises(exporter.InvalidFilter):
+                    self.export(resource, **filters)
+
+    def test_command_writes_csv_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.csv')
+            call_command('export_data', 'posts', '--format', 'csv',
+                         '--output', path, '--author', 'author',
+                         stderr=StringIO())
+            with open(path, encoding='utf-8', newline='') as source:
+                records = list(csv.DictReader(source))
+        self.assertEqual([record['text'] for record in records],
+                         ['Пост 1', 'Пост 3'])
+
+    def test_command_to_stdout_and_errors(self):
+        stdout = StringIO()
+        call_command('export_data', 'follows', stdout=stdout)
+        self.assertEqual(len(stdout.getvalue().splitlines()), 1)
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'follows', '--group', 'group',
+                         stdout=StringIO())
+
+    def test_view_is_staff_only(self):
+        url = reverse('posts:export_data', kwargs={'resource': 'posts'})
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertIn(reverse('admin:login'), response.url)
+
+    def test_view_streams_export(self):
+        client = Client()
+        client.force_login(self.staff)
+        response = client.get(
+            reverse('posts:export_data', kwargs={'resource': 'posts'}),
+            {'format': 'csv', 'group': 'group'})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="posts.csv"')
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(content.splitlines()), 4)
+        for params, status in (
+            ({'format': 'xml'}, HTTPStatus.BAD_REQUEST),
+            ({'since': 'вчера'}, HTTPStatus.BAD_REQUEST),
+        ):
+            with self.subTest(params=params):
+                response = client.get(reverse(
+                    'posts:export_data', kwargs={'resource': 'posts'}),
+                    params)
+                self.assertEqual(response.status_code, status)
+        response = client.get(reverse(
+            'posts:export_data', kwargs={'resource': 'users'}))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
@@ -0,0 +1,119 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание группы')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост в группе')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def urls(self):
+        return (
+            reverse('posts:latest_rss'),
+            reverse('posts:latest_atom'),
+            reverse('posts:group_rss', kwargs={'slug': 'group'}),
+            reverse('posts:group_atom', kwargs={'slug': 'group'}),
+            reverse('posts:author_rss', kwargs={'username': 'author'}),
+            reverse('posts:author_atom', kwargs={'username': 'author'}),
+        )
+
+    def test_feeds_contain_posts(self):
+        for url in self.urls():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('xml', response['Content-Type'])
+                content = response.content.decode()
+                self.assertIn('Пост в группе', content)
+                self.assertIn(reverse('posts:post_detail', kwargs={
+                    'post_id': self.post.pk}), content)
+                self.assertIn('Лев Толстой', content)
+
+    def test_atom_has_subtitle(self):
+        url = reverse('posts:group_atom', kwargs={'slug': 'group'})
+        self.assertIn('<subtitle>Описание группы</subtitle>',
+                      self.client.get(url).content.decode())
+
+    def test_missing_group_and_author(self):
+        for url in (
+            reverse('posts:group_rss', kwargs={'slug': 'missing'}),
+            reverse('posts:author_atom', kwargs={'username': 'missing'}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code,
+                                 HTTPStatus.NOT_FOUND)
+
+    def test_cached_feed_and_not_modified_without_queries(self):
+        """Повторы отдаются из кэша, 304 — без запросов к базе."""
+        url = reverse('posts:group_rss', kwargs={'slug': 'group'})
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+            not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.content, first.content)
+        self.assertEqual(cached['ETag'], first['ETag'])
+        self.assertEqual(not_modified.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_query_string_does_not_multiply_cache(self):
+        url = reverse('posts:group_rss', kwargs={'slug': 'group'})
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            for query in ('?x=1', '?x=2&y=3'):
+                with self.subTest(query=query):
+                    response = self.client.get(url + query)
+                    self.assertEqual(response['ETag'], first['ETag'])
+                    self.assertEqual(response.content, first.content)
+
+    def test_author_rename_invalidates_feed(self):
+        url = reverse('posts:group_rss', kwargs={'slug': 'group'})
+        etag = self.client.get(url)['ETag']
+        author = User.objects.get(pk=self.author.pk)
+        author.last_name = 'Достоевский'
+        author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('Лев Достоевский', response.content.decode())
+
+    def test_new_post_invalidates_feeds(self):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls()}
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn('Свежий пост', response.content.decode())
+
+    def test_group_rename_invalidates_feed(self):
+        url = reverse('posts:group_rss', kwargs={'slug': 'group'})
+        etag = self.client.get(url)['ETag']
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertIn('Новое название', response.content.decode())
+
+    def test_pages_link_to_feeds(self):
+        response = self.client.get(
+            reverse('posts:group_list', kwargs={'slug': 'group'}))
+        self.assertContains(
+            response, reverse('posts:group_atom', kwargs={'slug': 'group'}))
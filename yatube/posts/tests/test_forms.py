@@ -1,13 +1,16 @@
 import shutil
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import uploads
 from ..models import Post, Group, Comment
 
 User = get_user_model()
@@ -285,3 +288,85 @@ class PostCreateEditFormTests(TestCase):
         )
         self.assertEqual(Comment.objects.count(), comments_count)
         self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadProcessingTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, image, name='photo.jpg', **save_params):
+        buffer = BytesIO()
+        image.save(buffer, **save_params)
+        return self.upload_content(buffer.getvalue(), name)
+
+    def upload_content(self, content, name):
+        response = self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'С картинкой', 'image': SimpleUploadedFile(
+                name, content, content_type='image/jpeg')},
+        )
+        return response
+
+    def stored_image(self):
+        post = Post.objects.latest('pk')
+        return Image.open(post.image.path)
+
+    def test_exif_is_applied_and_stripped(self):
+        """Ориентация из EXIF применяется, сами метаданные удаляются."""
+        exif = Image.Exif()
+        exif[0x0112] = 6  # повернуть на 90° по часовой
+        exif[0x010f] = 'Camera'
+        self.upload(Image.new('RGB', (40, 20)), format='JPEG', exif=exif)
+        with self.stored_image() as image:
+            self.assertEqual(image.size, (20, 40))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_SIZE=(50, 50))
+    def test_large_image_is_downscaled(self):
+        """Картинка уменьшается до POST_IMAGE_MAX_SIZE."""
+        self.upload(Image.new('RGB', (400, 200)), format='JPEG')
+        with self.stored_image() as image:
+            self.assertEqual(image.size, (50, 25))
+
+    @override_settings(POST_IMAGE_MAX_DECODED_PIXELS=100)
+    def test_too_many_pixels_are_rejected(self):
+        """Картинка, которую пришлось бы декодировать целиком, отклоняется."""
+        posts_count = Post.objects.count()
+        response = self.upload(
+            Image.new('RGB', (40, 20)), name='big.png', format='PNG')
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка слишком большая: 40×20.')
+        self.assertEqual(Post.objects.count(), posts_count)
+
+    def test_truncated_image_is_rejected(self):
+        """Обрезанный файл открывается, но не декодируется — ошибка формы."""
+        posts_count = Post.objects.count()
+        buffer = BytesIO()
+        Image.effect_noise((64, 64), 64).save(buffer, format='JPEG')
+        content = buffer.getvalue()
+        response = self.upload_content(content[:len(content) // 2],
+                                       'truncated.jpg')
+        self.assertFormError(
+            response, 'form', 'image', 'Не удалось прочитать картинку.')
+        self.assertEqual(Post.objects.count(), posts_count)
+
+    def test_modes_without_png_support_are_converted(self):
+        """CMYK из TIFF сохраняется в PNG как RGB."""
+        self.upload(Image.new('CMYK', (10, 10), (0, 255, 0, 0)),
+                    name='photo.tif', format='TIFF')
+        with self.stored_image() as image:
+            self.assertEqual((image.format, image.mode), ('PNG', 'RGB'))
+            self.assertEqual(image.getpixel((0, 0)), (255, 0, 255))
+        palette = Image.new('P', (10, 10))
+        palette.info['transparency'] = 0
+        self.assertEqual(uploads.convert_for_png(palette).mode, 'RGBA')
@@ -0,0 +1,188 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from .. import fulltext, importer
+from ..models import Follow, Group, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImportPostsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        UserStats.objects.create(user=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def write_jsonl(self, records, name='posts.jsonl'):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            for record in records:
+                line = (record if isinstance(record, str)
+                        else json.dumps(record, ensure_ascii=False))
+                output.write(line + '\n')
+        return path
+
+    def run_import(self, path, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_posts', path, *args,
+                     stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_jsonl_import_in_batches(self):
+        """Посты создаются пачками с авторами, группами и датами."""
+        path = self.write_jsonl(
+            {'author': 'author', 'text': f'Пост {index}', 'group': 'group',
+             'pub_date': f'2020-01-{index + 1:02d}T12:00:00'}
+            for index in range(5))
+        stdout, stderr = self.run_import(path, '--batch-size', '2')
+        self.assertEqual(stderr, '')
+        self.assertIn('Импортировано постов: 5, пропущено: 0', stdout)
+        # Прогресс после каждой из трёх пачек
+        self.assertEqual(stdout.count('постов/с'), 3)
+        posts = Post.objects.order_by('pub_date')
+        self.assertEqual(
+            [post.text for post in posts], [f'Пост {x}' for x in range(5)])
+        self.assertEqual(posts[0].pub_date, timezone.make_aware(
+            datetime(2020, 1, 1, 12)))
+        self.assertTrue(all(post.group == self.group for post in posts))
+
+    def test_import_does_work_of_post_signals(self):
+        """Счётчики, ленты подписок и поисковый индекс обновлены."""
+        path = self.write_jsonl(
+            {'author': 'author', 'text': f'Импортированный {index}'}
+            for index in range(3))
+        self.run_import(path)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 3)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3)
+        if fulltext.is_available():
+            self.assertEqual(
+                Post.objects.filter(
+                    pk__in=fulltext.matching_ids('импортированный')).count(),
+                3)
+
+    def test_invalid_records_are_skipped(self):
+        path = self.write_jsonl([
+            {'author': 'author', 'text': 'Хороший'},
+            '{не json',
+            ['список'],
+            {'author': 'nobody', 'text': 'Без автора'},
+            {'author': 'author', 'text': ''},
+            {'author': 'author', 'text': 'Группа?', 'group': 'missing'},
+            {'author': 'author', 'text': 'Дата?', 'pub_date': 'вчера'},
+        ])
+        stdout, stderr = self.run_import(path)
+        self.assertIn('пропущено: 6', stdout)
+        for line in range(2, 8):
+            self.assertIn(f'Строка {line}:', stderr)
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Хороший'])
+
+    def test_create_missing(self):
+        path = self.write_jsonl(
+            [{'author': 'newcomer', 'text': 'Привет', 'group': 'new'}])
+        self.run_import(path, '--create-missing')
+        post = Post.objects.get()
+        self.assertEqual(post.author.username, 'newcomer')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.group.slug, 'new')
+
+    def test_csv_import(self):
+        path = os.path.join(self.directory, 'posts.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as output:
+            writer = csv.writer(output)
+            writer.writerow(['author', 'text', 'group'])
+            writer.writerow(['author', 'Текст, с запятой', 'group'])
+            writer.writerow(['author', 'Без группы', ''])
+        self.run_import(path)
+        self.assertEqual(Post.objects.filter(group=self.group).count(), 1)
+        self.assertTrue(Post.objects.filter(text='Текст, с запятой').exists())
+
+    def test_images_from_directory(self):
+        """Картинка копируется в хранилище через ту же обработку."""
+        images = os.path.join(self.directory, 'images')
+        os.mkdir(images)
+        Image.new('RGB', (20, 10)).save(os.path.join(images, 'photo.jpg'))
+        path = self.write_jsonl([
+            {'author': 'author', 'text': 'С картинкой', 'image': 'photo.jpg'},
+            {'author': 'author', 'text': 'Чужой файл',
+             'image': '../posts.jsonl'},
+            {'author': 'author', 'text': 'Нет файла', 'image': 'none.jpg'},
+        ])
+        stdout, _ = self.run_import(path, '--images', images)
+        self.assertIn('пропущено: 2', stdout)
+        post = Post.objects.get()
+        self.assertTrue(post.image.name.startswith('posts/photo'))
+        self.assertEqual((post.image.width, post.image.height), (20, 10))
+
+    def test_corrupt_image_skips_only_its_record(self):
+        images = os.path.join(self.directory, 'images')
+        os.mkdir(images)
+        Image.new('RGB', (20, 10)).save(os.path.join(images, 'photo.jpg'))
+        Image.effect_noise((64, 64), 64).save(
+            os.path.join(images, 'noise.jpg'))
+        with open(os.path.join(images, 'noise.jpg'), 'rb') as source:
+            content = source.read()
+        with open(os.path.join(images, 'broken.jpg'), 'wb') as output:
+            output.write(content[:len(content) // 2])
+        shutil.copy(os.path.join(images, 'photo.jpg'),
+                    os.path.join(images, 'locked.jpg'))
+        path = self.write_jsonl([
+            {'author': 'author', 'text': 'Первый', 'image': 'photo.jpg'},
+            {'author': 'author', 'text': 'Обрезанный', 'image': 'broken.jpg'},
+            {'author': 'author', 'text': 'Без доступа', 'image': 'locked.jpg'},
+            {'author': 'author', 'text': 'Последний', 'image': 'photo.jpg'},
+        ])
+        real_process_image = importer.process_image
+
+        def process_image(uploaded):
+            if uploaded.name == 'locked.jpg':
+                raise PermissionError('нет доступа')
+            return real_process_image(uploaded)
+
+        with mock.patch.object(importer, 'process_image', process_image):
+            stdout, stderr = self.run_import(path, '--images', images)
+        self.assertIn('пропущено: 2', stdout)
+        self.assertIn('Строка 2: Не удалось прочитать картинку.', stderr)
+        self.assertIn('Строка 3: не удалось прочитать картинку locked.jpg: '
+                      'нет доступа', stderr)
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Первый', 'Последний'])
+
+    def test_unknown_format_and_missing_file(self):
+        with self.assertRaises(CommandError):
+            self.run_import(os.path.join(self.directory, 'posts.txt'))
+        with self.assertRaises(CommandError):
+            self.run_import(os.path.join(self.directory, 'missing.jsonl'))
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from ..models import Post
+from ..paginators import CachedCountPaginator
+
+User = get_user_model()
+
+
+class CachedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Пост {x}') for x in range(25)])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached(self):
+        """COUNT(*) выполняется один раз на время жизни оценки."""
+        CachedCountPaginator(Post.objects.all(), 10).count
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                CachedCountPaginator(Post.objects.all(), 10).count, 25)
+
+    def test_stale_count_is_corrected_by_page(self):
+        """Устаревшая оценка уточняется при чтении страницы."""
+        paginator = CachedCountPaginator(Post.objects.all(), 10)
+        cache.set(paginator._count_key(), 5)
+        page = paginator.get_page(3)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next())
+        self.assertEqual(
+            CachedCountPaginator(Post.objects.all(), 10).count, 25)
+
+    def test_page_beyond_estimate_falls_back_to_last(self):
+        """Номер за концом ленты отдаёт последнюю страницу."""
+        page = CachedCountPaginator(Post.objects.all(), 10).get_page(9)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 5)
+
+    def test_stale_count_after_deletes_is_recounted(self):
+        """Оценка, отставшая от удалений, не роняет страницу за концом."""
+        paginator = CachedCountPaginator(Post.objects.all(), 10)
+        cache.set(paginator._count_key(), 500)
+        page = paginator.get_page(50)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), 5)
+        self.assertEqual(
+            CachedCountPaginator(Post.objects.all(), 10).count, 25)
+
+    def test_elided_page_range(self):
+        """Диапазон страниц не растёт вместе с лентой."""
+        paginator = CachedCountPaginator(Post.objects.all(), 1)
+        ellipsis = paginator.ELLIPSIS
+        self.assertEqual(
+            list(paginator.get_elided_page_range(13)),
+            [1, 2, ellipsis, 10, 11, 12, 13, 14, 15, 16, ellipsis, 24, 25])
+        self.assertEqual(
+            list(paginator.get_elided_page_range(1)),
+            [1, 2, 3, 4, ellipsis, 24, 25])
@@ -0,0 +1,148 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import fulltext
+from ..models import Comment, Follow, Group, Post, PulledAuthor
+
+User = get_user_model()
+
+# Полный проход по таблице: SCAN без индекса (виртуальные таблицы FTS,
+# подзапросы во FROM и константы не в счёт) и сортировка во временном
+# B-дереве.
+FULL_SCAN = re.compile(
+    r'\bSCAN (?!subquery\b)(?!.*\b(USING|VIRTUAL TABLE|CONSTANT)\b)')
+TEMP_SORT = re.compile(r'USE TEMP B-TREE')
+
+# Оправданные исключения: (шаг плана, фрагмент запроса).
+ALLOWED = (
+    # Выбор группы в форме поста — весь список групп, он невелик.
+    ('SCAN posts_group', 'FROM "posts_group" ORDER BY'),
+    # Релевантность FTS5 считается при поиске, индекса по ней нет.
+    ('USE TEMP B-TREE FOR ORDER BY', 'ORDER BY rank'),
+)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN SQLite')
+class QueryPlanTests(TestCase):
+    """
+    Каждый запрос view из posts/views.py идёт по индексу: без полного
+    прохода по таблице и без сортировки во временном B-дереве.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.pulled = User.objects.create_user(username='pulled')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.pulled)
+        PulledAuthor.objects.create(author=cls.pulled)
+        for index in range(30):
+            post = Post.objects.create(
+                author=cls.author if index % 3 else cls.pulled,
+                group=cls.group if index % 2 else None,
+                text=f'Пост номер {index}')
+        cls.post = post
+        for index in range(3):
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Ответ {index}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertIndexedQueries(self, url, data=None, method='get',
+                             status=200):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status, url)
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            for step in self.plan(sql):
+                if any(step.startswith(allowed) and fragment in sql
+                       for allowed, fragment in ALLOWED):
+                    continue
+                with self.subTest(url=url, data=data, step=step, sql=sql):
+                    self.assertIsNone(FULL_SCAN.search(step))
+                    self.assertIsNone(TEMP_SORT.search(step))
+
+    def next_cursor(self, url):
+        return self.client.get(url).context['page_obj'].next_cursor
+
+    def test_index(self):
+        url = reverse('posts:index')
+        self.assertIndexedQueries(url)
+        self.assertIndexedQueries(url, {'page': 2})
+        self.assertIndexedQueries(url, {'after': self.next_cursor(url)})
+
+    def test_group_posts(self):
+        url = reverse('posts:group_list', kwargs={'slug': 'group'})
+        self.assertIndexedQueries(url)
+        self.assertIndexedQueries(url, {'after': self.next_cursor(url)})
+
+    def test_profile(self):
+        url = reverse('posts:profile', kwargs={'username': 'author'})
+        self.assertIndexedQueries(url)
+        self.assertIndexedQueries(url, {'after': self.next_cursor(url)})
+
+    def test_post_detail_and_comments(self):
+        self.assertIndexedQueries(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertIndexedQueries(
+            reverse('posts:comment_list', kwargs={'post_id': self.post.pk}),
+            {'comments_order': 'newest'})
+
+    def test_follow_index(self):
+        url = reverse('posts:follow_index')
+        self.assertIndexedQueries(url)
+        self.assertIndexedQueries(url, {'after': self.next_cursor(url)})
+
+    @skipUnless(fulltext.is_available(), 'FTS5')
+    def test_search(self):
+        self.assertIndexedQueries(reverse('posts:search'), {'q': 'пост'})
+
+    def test_post_forms(self):
+        self.client.force_login(self.post.author)
+        self.assertIndexedQueries(reverse('posts:post_create'))
+        self.assertIndexedQueries(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}))
+
+    def test_add_comment(self):
+        self.assertIndexedQueries(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'Ещё ответ'}, method='post', status=302)
+
+    def test_follow_and_unfollow(self):
+        kwargs = {'username': 'author'}
+        self.assertIndexedQueries(
+            reverse('posts:profile_unfollow', kwargs=kwargs))
+        self.assertIndexedQueries(
+            reverse('posts:profile_follow', kwargs=kwargs))
+
+    def test_export_data(self):
+        self.client.force_login(
+            User.objects.create_user(username='staff', is_staff=True))
+        for resource in ('posts', 'comments', 'follows'):
+            self.assertIndexedQueries(
+                reverse('posts:export_data', kwargs={'resource': resource}),
+                {'author': 'author'})
@@ -0,0 +1,86 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import fulltext
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(LIMIT_ITEMS=2)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.posts = [
+            Post.objects.create(author=cls.user, text=text)
+            for text in (
+                'Кошка спит на диване',
+                'Кошка, кошка и ещё раз кошка',
+                'Собака лает на кошку',
+                'Про погоду',
+            )
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params})
+        return response.context['page_obj']
+
+    def test_results_are_ranked(self):
+        """Самый релевантный пост первым, префиксы тоже находятся."""
+        page_obj = self.search('кошк')
+        self.assertEqual(page_obj.paginator.count, 3)
+        self.assertEqual(page_obj.object_list[0], self.posts[1])
+
+    def test_keyset_pages_cover_all_results(self):
+        """Курсоры вперёд и назад листают выдачу без пропусков."""
+        first = self.search('кошк')
+        second = self.search('кошк', after=first.next_cursor)
+        self.assertFalse(second.has_next())
+        found = list(first.object_list) + list(second.object_list)
+        self.assertCountEqual(found, self.posts[:3])
+        back = self.search('кошк', before=second.previous_cursor)
+        self.assertEqual(list(back.object_list), list(first.object_list))
+
+    def test_index_follows_post_changes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = Post.objects.get(pk=self.posts[3].pk)
+        post.text = 'Кошка под дождём'
+        post.save()
+        self.assertEqual(self.search('дождём').object_list[0], post)
+        post.delete()
+        self.assertEqual(list(self.search('дождём').object_list), [])
+
+    def test_query_syntax_is_not_passed_to_fts(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        self.assertEqual(list(self.search('"кошка* (').object_list),
+                         list(self.search('кошка').object_list))
+        self.assertEqual(list(self.search('*').object_list), [])
+
+    def test_rebuild_search_index_command(self):
+        """rebuild_search_index восстанавливает индекс."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {fulltext.FTS_TABLE}')
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('погоду').object_list[0], self.posts[3])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через MATCH, а не LIKE."""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собака'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.posts[2]])
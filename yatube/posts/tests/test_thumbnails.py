@@ -0,0 +1,157 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import processes
+
+from .. import thumbnails
+from ..models import Post, Thumbnail
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=2)
+class DeferredThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.guest_client = Client()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, text='С картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'))
+
+    def detail(self):
+        return self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+
+    def test_placeholder_until_thumbnail_exists(self):
+        """Пока миниатюры нет, шаблон отдаёт заглушку и ставит задачу."""
+        self.assertContains(self.detail(), 'data:image/svg+xml')
+        self.assertTrue(
+            cache.get(thumbnails.pending_key(self.post.image.name)))
+
+    def test_generated_thumbnail_replaces_placeholder(self):
+        """
+        Готовая миниатюра попадает в шаблон и в закэшированные блоки,
+        а ETag меняется; дата изменения поста остаётся прежней.
+        """
+        updated = self.post.updated
+        profile = reverse('posts:profile', kwargs={'username': 'auth'})
+        etags = {url: self.guest_client.get(url)['ETag']
+                 for url in (profile, self.detail().wsgi_request.path)}
+        thumbnails.generate_thumbnails(self.post.image.name)
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotContains(response, 'data:image/svg+xml')
+                self.assertContains(response, settings.MEDIA_URL + 'cache/')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.updated, updated)
+
+    def test_picture_lists_webp_variants(self):
+        """После генерации <picture> отдаёт WebP-варианты через srcset."""
+        self.assertNotContains(self.detail(), '<source')
+        thumbnails.generate_thumbnails(self.post.image.name)
+        response = self.detail()
+        self.assertContains(response, 'type="image/webp"')
+        for width in settings.POST_IMAGE_WIDTHS:
+            self.assertContains(response, f'.webp {width}w')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_thumbnails_are_recorded(self):
+        """Миниатюры записываются в Thumbnail с размерами."""
+        thumbnails.generate_thumbnails(self.post.image.name)
+        main = Thumbnail.objects.get(
+            post=self.post, geometry='960x339', format='JPEG')
+        self.assertEqual((main.width, main.height), (960, 339))
+        self.assertEqual(
+            self.post.thumbnails.count(),
+            1 + len(settings.POST_IMAGE_WIDTHS)
+            * len(thumbnails.supported_formats()))
+
+    def test_feed_page_prefetches_thumbnails(self):
+        """Миниатюры страницы ленты читаются одним запросом."""
+        url = reverse('posts:profile', kwargs={'username': 'auth'})
+
+        def count_queries():
+            thumbnails.generate_thumbnails(self.post.image.name)
+            self.guest_client.get(url)
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.guest_client.get(url)
+            return len(queries), response
+
+        single, _ = count_queries()
+        for x in range(3):
+            Post.objects.create(
+                author=self.user, text=f'Ещё {x}', image=self.post.image.name)
+        several, response = count_queries()
+        self.assertEqual(single, several)
+        self.assertContains(response, '.webp 320w', count=4)
+
+    def test_cached_articles_skip_thumbnail_query(self):
+        """Если все блоки страницы в кэше, миниатюры не читаются."""
+        url = reverse('posts:profile', kwargs={'username': 'auth'})
+        thumbnails.generate_thumbnails(self.post.image.name)
+        self.guest_client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest_client.get(url)
+        self.assertContains(response, '.webp 320w')
+        # ETag профиля берёт из миниатюр только наибольший id.
+        select = f'SELECT "{Thumbnail._meta.db_table}".'
+        self.assertFalse(
+            [query for query in queries if select in query['sql']])
+
+    def test_enqueue_is_deduplicated(self):
+        """Повторные промахи не ставят картинку в очередь ещё раз."""
+        name = self.post.image.name
+        self.assertTrue(cache.add(thumbnails.pending_key(name), True))
+        self.detail()
+        self.assertEqual(cache.get(thumbnails.pending_key(name)), True)
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_pool_processes_are_spawned(self):
+        """Процессы пула не форкаются из потока запроса и видят настройки."""
+        executor = thumbnails._get_executor()
+        self.addCleanup(setattr, thumbnails, '_executor', None)
+        self.addCleanup(executor.shutdown)
+        self.assertEqual(executor._mp_context.get_start_method(), 'spawn')
+        future = executor.submit(processes.inherited_settings)
+        self.assertEqual(future.result(timeout=60)['MEDIA_ROOT'],
+                         TEMP_MEDIA_ROOT)
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_without_workers_thumbnail_is_rendered_in_request(self):
+        """Без пула тег создаёт миниатюру сам, как обычный sorl."""
+        self.assertNotContains(self.detail(), 'data:image/svg+xml')
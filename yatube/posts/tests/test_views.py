@@ -9,7 +9,9 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.conf import settings
 
+from .. import fragments
 from ..models import Post, Group, Comment, Follow
+from ..paginators import pack_cursor
 
 User = get_user_model()
 
@@ -60,6 +62,58 @@ class PagesMultiPagesTests(TestCase):
                                  settings.POSTS_FOR_TESTING_QUANTITY
                                  - settings.FIRST_PAGE_OBJ_COUNT)
 
+    def test_cursor_page_obj(self):
+        """Курсоры ?after= и ?before= листают ленту без OFFSET."""
+        templates_pages_names = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user.username})
+        )
+        for reverse_name in templates_pages_names:
+            with self.subTest(reverse_name=reverse_name):
+                first_page = self.guest_client.get(
+                    reverse_name).context['page_obj']
+                second_page = self.guest_client.get(
+                    reverse_name,
+                    {'after': first_page.next_cursor}).context['page_obj']
+                self.assertEqual(second_page.number, 2)
+                self.assertFalse(second_page.has_next())
+                self.assertEqual(
+                    list(second_page.object_list),
+                    list(self.guest_client.get(
+                        reverse_name,
+                        {'page': 2}).context['page_obj'].object_list))
+                back_page = self.guest_client.get(
+                    reverse_name,
+                    {'before': second_page.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(back_page.number, 1)
+                self.assertEqual(list(back_page.object_list),
+                                 list(first_page.object_list))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        """Испорченный курсор отдаёт первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'after': 'испорчен'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.FIRST_PAGE_OBJ_COUNT)
+
+    def test_out_of_range_cursor_falls_back_to_first_page(self):
+        """Курсор с id или датой вне диапазона базы не роняет ленту."""
+        now = '2020-01-01T00:00:00+00:00'
+        for cursor in (pack_cursor(now, 2 ** 63, 2),
+                       pack_cursor(now, 0, 2),
+                       pack_cursor('0001-01-01T00:00:00+14:00', 1, 2),
+                       pack_cursor('2020-01-01T00:00:00', 1, 2)):
+            for name in ('after', 'before'):
+                with self.subTest(cursor=cursor, name=name):
+                    response = self.guest_client.get(
+                        reverse('posts:index'), {name: cursor})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual(
+                        response.context['page_obj'].number, 1)
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PagesSinglePageTests(TestCase):
@@ -116,6 +170,11 @@ class PagesSinglePageTests(TestCase):
         super().tearDownClass()
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
+    def setUp(self):
+        # Откат транзакции теста не шлёт сигналов, версии лент в кэше
+        # пережили бы его вместе со старыми фрагментами.
+        cache.clear()
+
     def test_pages_uses_correct_template(self):
         """URL-адрес использует соответствующий шаблон."""
         templates_pages_names = {
@@ -184,16 +243,41 @@ class PagesSinglePageTests(TestCase):
     def test_index_use_cache(self):
         """Страница index использует кэш"""
         response = self.guest_client.get(reverse('posts:index'))
-        Post.objects.create(
-            author=self.user,
-            text='victim',
-            group=self.group)
+        # update() не шлёт сигналов: фрагмент остаётся в кэше
+        Post.objects.filter(pk=self.post.pk).update(text='victim')
         response_2 = self.guest_client.get(reverse('posts:index'))
         self.assertEqual(response.content, response_2.content)
         cache.clear()
         response_2 = self.guest_client.get(reverse('posts:index'))
         self.assertNotEqual(response.content, response_2.content)
 
+    def test_index_cache_is_shared_between_users(self):
+        """Фрагмент index один для гостей и пользователей"""
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.filter(pk=self.post.pk).update(text='victim')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'victim')
+
+    def test_new_post_invalidates_feed_cache(self):
+        """Новый пост сразу сбрасывает кэш лент"""
+        Follow.objects.create(user=self.user_not_author, author=self.user)
+        self.guest_client.get(reverse('posts:index'))
+        self.authorized_client_not_author.get(reverse('posts:follow_index'))
+        Post.objects.create(author=self.user, text='victim')
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'victim')
+        response = self.authorized_client_not_author.get(
+            reverse('posts:follow_index'))
+        self.assertContains(response, 'victim')
+
+    def test_follow_invalidates_follow_feed_cache(self):
+        """Подписка сразу сбрасывает кэш ленты подписчика"""
+        self.authorized_client_not_author.get(reverse('posts:follow_index'))
+        Follow.objects.create(user=self.user_not_author, author=self.user)
+        response = self.authorized_client_not_author.get(
+            reverse('posts:follow_index'))
+        self.assertContains(response, self.post.text)
+
     def test_group_post_page_show_correct_context(self):
         """Шаблон group_list сформирован с правильным контекстом."""
         response = self.guest_client.get(
@@ -291,7 +375,7 @@ class PagesSinglePageTests(TestCase):
         на которых подписан пользователь."""
         response = self.authorized_client.get(
             reverse('posts:follow_index'))
-        obj_count = response.context.get('page_obj').object_list.count()
+        obj_count = len(response.context.get('page_obj').object_list)
         self.assertEqual(obj_count, 1)
 
     def test_create_follow_authorized(self):
@@ -319,3 +403,115 @@ class PagesSinglePageTests(TestCase):
             follow=True
         )
         self.assertEqual(Follow.objects.count(), follows_count)
+
+
+@override_settings(LIMIT_COMMENTS=3)
+class CommentsPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'commentator{x}'),
+                text=f'Комментарий {x}')
+            for x in range(5)
+        ]
+        cls.guest_client = Client()
+
+    def test_post_detail_shows_first_comments(self):
+        """post_detail показывает первую порцию комментариев."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        self.assertEqual(list(response.context['comments']),
+                         self.comments[:3])
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+            {'comments_order': 'newest'})
+        self.assertEqual(list(response.context['comments']),
+                         self.comments[:1:-1])
+
+    def test_comment_list_fragment_loads_next_comments(self):
+        """Фрагмент «Показать ещё» отдаёт только следующую порцию."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        cursor = response.context['comments_page'].next_cursor
+        response = self.guest_client.get(
+            reverse('posts:comment_list', kwargs={'post_id': self.post.pk}),
+            {'comments_after': cursor})
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+        self.assertEqual(list(response.context['comments']),
+                         self.comments[3:])
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_comment_authors_are_fetched_with_comments(self):
+        """Авторы комментариев не запрашиваются по одному."""
+        url = reverse('posts:comment_list', kwargs={'post_id': self.post.pk})
+        self.guest_client.get(url)
+        with self.assertNumQueries(2):
+            self.guest_client.get(url)
+
+
+class ArticleCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Группа', description='Описание', slug='group')
+        cls.guest_client = Client()
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            author=self.user, group=self.group, text='Исходный текст')
+
+    def test_article_block_is_cached(self):
+        """Блок поста берётся из кэша, пока пост не изменён."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        Post.objects.filter(pk=self.post.pk).update(text='Тихая правка')
+        self.assertContains(self.guest_client.get(url), 'Исходный текст')
+
+    def test_edit_changes_article_key(self):
+        """Сохранение поста обновляет updated и ключ блока."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertContains(self.guest_client.get(url), 'Новый текст')
+
+    def test_flags_are_part_of_article_key(self):
+        """Блоки с разными флагами ссылок кэшируются раздельно."""
+        self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'все записи группы')
+
+    def test_author_rename_changes_article_key(self):
+        """Новое имя автора видно сразу, не через ARTICLE_CACHE_TIMEOUT."""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.guest_client.get(url)
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        self.assertContains(self.guest_client.get(url), 'Переименованный')
+
+    def test_group_slug_change_reaches_cached_feed(self):
+        """Ссылка на группу в ленте меняется вместе со slug."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        self.group.slug = 'renamed'
+        self.group.save()
+        self.assertContains(
+            self.guest_client.get(url),
+            reverse('posts:group_list', kwargs={'slug': 'renamed'}))
+
+    def test_login_keeps_feed_version(self):
+        """Вход пользователя (last_login) не сбрасывает кэш лент."""
+        version = fragments.get_version(fragments.POSTS_VERSION_KEY)
+        Client().force_login(self.user)
+        self.assertEqual(
+            fragments.get_version(fragments.POSTS_VERSION_KEY), version)
@@ -0,0 +1,267 @@
+"""
+Миниатюры картинок постов создаются вне запроса.
+
+post_create и post_edit после коммита ставят картинку в очередь пула
+процессов, и тот создаёт миниатюры всех ``THUMBNAIL_GEOMETRIES``
+и адаптивные варианты первой из них: ширины ``POST_IMAGE_WIDTHS``
+в форматах ``POST_IMAGE_FORMATS``, которые умеет сохранять Pillow.
+Готовые миниатюры записываются в Thumbnail; лента подгружает их
+для всей страницы одним запросом (prefetch), а тег ``post_picture``
+берёт их оттуда. Если миниатюр ещё нет, картинка ставится в очередь,
+а шаблон показывает заглушку того же размера. Когда миниатюры готовы,
+закэшированные блоки этих постов удаляются, а версия лент растёт, чтобы
+кэш не держал заглушку; ``updated`` не трогается — это дата правки
+автором. ETag страниц учитывает миниатюры сам (conditional).
+
+Процессы пула запускаются через spawn (core.processes), а не fork.
+
+Тег sorl ``{% thumbnail %}`` идёт через DeferredThumbnailBackend
+и ведёт себя так же: готовая миниатюра из KVStore или заглушка.
+
+При ``THUMBNAIL_WORKERS = 0`` пула нет: после коммита миниатюры
+создаются в том же процессе, а при промахе — прямо в запросе.
+"""
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from PIL import Image
+from sorl.thumbnail import default
+from sorl.thumbnail.base import EXTENSIONS, ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.helpers import serialize, tokey
+from sorl.thumbnail.images import DummyImageFile, ImageFile
+
+from core import processes, prometheus
+
+from . import fragments
+from .models import Post, Thumbnail
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{x}" height="{y}">'
+    '<rect width="100%" height="100%" fill="#e9ecef"/></svg>'
+)
+# Форматы, о которых sorl не знает.
+EXTRA_EXTENSIONS = {'AVIF': 'avif'}
+VARIANT_QUALITY = {'AVIF': 60, 'WEBP': 80}
+# Пока задача в очереди, промахи в шаблонах её не дублируют.
+PENDING_TIMEOUT = 5 * 60
+
+_executor = None
+
+GENERATION_TIME = prometheus.Histogram(
+    'yatube_thumbnail_generation_seconds',
+    'Создание всех миниатюр одной картинки.',
+    buckets=(.1, .25, .5, 1, 2.5, 5, 10, 30))
+QUEUE_DEPTH = prometheus.Gauge(
+    'yatube_thumbnail_queue_depth', 'Картинки в очереди пула миниатюр.')
+
+
+class Placeholder(DummyImageFile):
+    """Серый прямоугольник размера миниатюры, без запросов наружу."""
+
+    @property
+    def url(self):
+        svg = PLACEHOLDER_SVG.format(x=self.x, y=self.y)
+        return 'data:image/svg+xml,' + quote(svg)
+
+
+class DeferredThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl для шаблонов: читает готовые миниатюры, не создаёт."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not settings.THUMBNAIL_WORKERS:
+            return super().get_thumbnail(file_, geometry_string, **options)
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self.full_options(source, options))
+        cached = default.kvstore.get(ImageFile(name, default.storage))
+        if cached:
+            return cached
+        enqueue(source.name)
+        return Placeholder(geometry_string)
+
+    def generate(self, file_, geometry_string, **options):
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        if options['format'] in EXTENSIONS:
+            return super()._get_thumbnail_filename(
+                source, geometry_string, options)
+        key = tokey(source.key, geometry_string, serialize(options))
+        return '%s%s/%s/%s.%s' % (
+            thumbnail_settings.THUMBNAIL_PREFIX, key[:2], key[2:4], key,
+            EXTRA_EXTENSIONS[options['format']])
+
+    def full_options(self, source, options):
+        """Опции с умолчаниями, как их дополняет ThumbnailBackend."""
+        options = dict(options)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+
+def supported_formats():
+    Image.init()
+    return [image_format for image_format in settings.POST_IMAGE_FORMATS
+            if image_format in Image.SAVE]
+
+
+def variant_geometries():
+    """
+    Адаптивные варианты основной миниатюры: (формат, ширина, геометрия,
+    опции) с теми же пропорциями и кадрированием.
+    """
+    geometry, options = settings.THUMBNAIL_GEOMETRIES[0]
+    base_width, base_height = map(int, geometry.split('x'))
+    for image_format in supported_formats():
+        for width in settings.POST_IMAGE_WIDTHS:
+            height = round(width * base_height / base_width)
+            yield image_format, width, f'{width}x{height}', {
+                **options,
+                'format': image_format,
+                'quality': VARIANT_QUALITY.get(image_format, 80),
+            }
+
+
+def all_geometries():
+    yield from settings.THUMBNAIL_GEOMETRIES
+    for _, _, geometry, options in variant_geometries():
+        yield geometry, options
+
+
+def pending_key(name):
+    return f'thumbnails:pending:{name}'
+
+
+def image_format(options):
+    return options.get('format', thumbnail_settings.THUMBNAIL_FORMAT)
+
+
+def generate_thumbnails(name):
+    """
+    Создаёт миниатюры и варианты и записывает их в Thumbnail для всех
+    постов с этой картинкой; выполняется в пуле процессов.
+    """
+    backend = DeferredThumbnailBackend()
+    created = []
+    start = time.perf_counter()
+    try:
+        for geometry, options in all_geometries():
+            thumbnail = default.kvstore.get(
+                backend.generate(name, geometry, **options))
+            # Нет в KVStore — исходник не прочитался, миниатюры нет.
+            if thumbnail:
+                created.append((geometry, image_format(options), thumbnail))
+    finally:
+        cache.delete(pending_key(name))
+        GENERATION_TIME.observe(time.perf_counter() - start)
+    if not created:
+        return
+    posts = Post.objects.filter(image=name)
+    with transaction.atomic():
+        Thumbnail.objects.filter(post__in=posts).delete()
+        Thumbnail.objects.bulk_create(
+            Thumbnail(post_id=post_id, geometry=geometry,
+                      format=thumbnail_format, name=thumbnail.name,
+                      width=thumbnail.width, height=thumbnail.height)
+            for post_id in posts.values_list('pk', flat=True)
+            for geometry, thumbnail_format, thumbnail in created
+        )
+    if settings.THUMBNAIL_WORKERS:
+        # Закэшированные блоки и ленты ещё показывают заглушку.
+        fragments.forget_articles(posts.select_related('author', 'group'))
+        fragments.bump(fragments.POSTS_VERSION_KEY)
+
+
+def prefetch(posts):
+    """Миниатюры всех постов страницы одним запросом."""
+    prefetch_related_objects(list(posts), 'thumbnails')
+
+
+def thumbnail_map(post):
+    """
+    Миниатюры поста по (геометрия, формат). Если их нет, картинка
+    ставится в очередь, а без пула миниатюры создаются сразу.
+    """
+    thumbnails = {(thumbnail.geometry, thumbnail.format): thumbnail
+                  for thumbnail in post.thumbnails.all()}
+    if thumbnails or not post.image:
+        return thumbnails
+    if settings.THUMBNAIL_WORKERS:
+        enqueue(post.image.name)
+        return thumbnails
+    generate_thumbnails(post.image.name)
+    return {(thumbnail.geometry, thumbnail.format): thumbnail
+            for thumbnail in Thumbnail.objects.filter(post=post)}
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=get_context('spawn'),
+            initializer=processes.setup,
+            initargs=(processes.inherited_settings(),),
+        )
+    return _executor
+
+
+def _task_done(future):
+    QUEUE_DEPTH.inc(-1)
+    if future.exception() is not None:
+        logger.error('Thumbnail generation failed',
+                     exc_info=future.exception())
+
+
+def _submit(name):
+    global _executor
+    if not settings.THUMBNAIL_WORKERS:
+        try:
+            generate_thumbnails(name)
+        except Exception:
+            logger.exception('Thumbnail generation failed')
+        return
+    try:
+        future = _get_executor().submit(generate_thumbnails, name)
+    except BrokenProcessPool:
+        # Пул пересоздастся при следующей картинке, эту повторит
+        # первый же промах в шаблоне.
+        logger.exception('Thumbnail pool is broken')
+        _executor = None
+        cache.delete(pending_key(name))
+        return
+    QUEUE_DEPTH.inc()
+    future.add_done_callback(_task_done)
+
+
+def enqueue(name):
+    """Ставит картинку в очередь после коммита текущей транзакции."""
+    if not cache.add(pending_key(name), True, PENDING_TIMEOUT):
+        return
+    transaction.on_commit(lambda: _submit(name))
+
+
+def schedule(post):
+    post.thumbnails.all().delete()
+    if post.image:
+        enqueue(post.image.name)
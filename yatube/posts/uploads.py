@@ -0,0 +1,84 @@
+"""
+Обработка загруженных картинок постов с ограниченной памятью.
+
+Размер в пикселях берётся из заголовка, до декодирования. JPEG
+декодируется сразу уменьшенным (draft, масштаб DCT 1/2–1/8), и уже
+после этого декодируемых пикселей должно быть не больше
+``POST_IMAGE_MAX_DECODED_PIXELS`` — иначе картинка отклоняется, так что
+память на одну загрузку ограничена независимо от размера исходника.
+Затем картинка поворачивается по EXIF, уменьшается до
+``POST_IMAGE_MAX_SIZE`` и пересохраняется без EXIF и прочих метаданных.
+У анимаций остаётся первый кадр. Форматы, которые не сохраняем как есть,
+пересохраняются в PNG, с переводом CMYK и подобных режимов в RGB(A).
+Файл, который не удалось декодировать (например, обрезанный), — ошибка
+проверки, а не сбой запроса.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+# Формат, расширение и параметры сохранения; остальное сохраняем в PNG.
+SAVE_FORMATS = {
+    'JPEG': ('jpg', {'quality': 90, 'optimize': True}),
+    'PNG': ('png', {'optimize': True}),
+    'GIF': ('gif', {}),
+    'WEBP': ('webp', {'quality': 90}),
+}
+# Метаданные, без которых картинка выглядит иначе; остальные отбрасываем.
+KEPT_INFO = ('transparency', 'icc_profile')
+# Режимы, которые PNG умеет сохранить; CMYK, YCbCr и другие — нет.
+PNG_MODES = ('1', 'L', 'LA', 'I', 'I;16', 'P', 'RGB', 'RGBA')
+
+
+def process_image(uploaded):
+    """Проверенная, повёрнутая и уменьшенная копия загрузки без EXIF."""
+    uploaded.seek(0)
+    try:
+        image = Image.open(uploaded)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось прочитать картинку.')
+    with image:
+        source_format = image.format
+        image.draft(None, settings.POST_IMAGE_MAX_SIZE)
+        width, height = image.size
+        if width * height > settings.POST_IMAGE_MAX_DECODED_PIXELS:
+            raise ValidationError(
+                'Картинка слишком большая: %(width)s×%(height)s.',
+                params={'width': width, 'height': height})
+        image_format = (
+            source_format if source_format in SAVE_FORMATS else 'PNG')
+        extension, params = SAVE_FORMATS[image_format]
+        buffer = BytesIO()
+        # Обрезанный файл открывается, но падает при декодировании.
+        try:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(settings.POST_IMAGE_MAX_SIZE, reducing_gap=3.0)
+            if image_format == 'PNG' and source_format != 'PNG':
+                image = convert_for_png(image)
+            image.info = {
+                key: image.info[key] for key in KEPT_INFO
+                if key in image.info}
+            image.save(buffer, format=image_format, **params)
+        except (OSError, ValueError):
+            raise ValidationError('Не удалось прочитать картинку.')
+    name = os.path.splitext(os.path.basename(uploaded.name))[0]
+    return SimpleUploadedFile(
+        f'{name}.{extension}', buffer.getvalue(),
+        content_type=Image.MIME[image_format])
+
+
+def convert_for_png(image):
+    """Картинка в режиме, который PNG сохраняет без потерь смысла."""
+    if image.mode == 'P' and 'transparency' in image.info:
+        return image.convert('RGBA')
+    if image.mode in PNG_MODES:
+        return image
+    has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+    converted = image.convert('RGBA' if has_alpha else 'RGB')
+    # Профиль описывал прежнее цветовое пространство (например, CMYK).
+    converted.info.pop('icc_profile', None)
+    return converted
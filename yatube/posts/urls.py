@@ -1,12 +1,23 @@
 from django.urls import path
 
-from . import views
+from . import feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    # Ленты RSS и Atom
+    path('rss/', feeds.latest_rss, name='latest_rss'),
+    path('atom/', feeds.latest_atom, name='latest_atom'),
+    path('group/<slug:slug>/rss/', feeds.group_rss, name='group_rss'),
+    path('group/<slug:slug>/atom/', feeds.group_atom, name='group_atom'),
+    path('profile/<str:username>/rss/', feeds.author_rss, name='author_rss'),
+    path('profile/<str:username>/atom/',
+         feeds.author_atom,
+         name='author_atom'),
+    # Полнотекстовый поиск по постам
+    path('search/', views.search, name='search'),
     # Профайл пользователя
     path('profile/<str:username>/', views.profile, name='profile'),
     # Просмотр записи
@@ -19,6 +30,12 @@ urlpatterns = [
     path('posts/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
+    # Следующая порция комментариев (фрагмент для «Показать ещё»)
+    path('posts/<int:post_id>/comments/',
+         views.comment_list,
+         name='comment_list'),
+    # Потоковая выгрузка для персонала
+    path('export/<str:resource>/', views.export_data, name='export_data'),
     # Страница с постами от подписок
     path('follow/', views.follow_index, name='follow_index'),
     path(
@@ -1,29 +1,62 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import Http404, HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.conf import settings
+from django.utils.http import urlencode
+from django.db import transaction
+from django.views.decorators.http import condition
 
+from . import (conditional, counters, exporter, fragments, fulltext,
+               thumbnails, timelines)
 from .forms import PostForm, CommentForm
 from .models import Post, Group, User, Follow
+from .paginators import CursorPaginator
 
 
 def paginator(request, post_list):
-    _paginator = Paginator(post_list, settings.LIMIT_ITEMS)
-    page_number = request.GET.get('page')
-    page_obj = _paginator.get_page(page_number)
-    return page_obj
+    return cursor_page(
+        request, CursorPaginator(post_list, settings.LIMIT_ITEMS))
+
+
+def cursor_page(request, _paginator):
+    return _paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        number=request.GET.get('page'),
+    )
+
+
+def comments_page(request, post):
+    order = request.GET.get('comments_order')
+    comment_list = post.comments.select_related('author')
+    _paginator = CursorPaginator(
+        comment_list, settings.LIMIT_COMMENTS,
+        lookups=('created', 'pk'), date_attr='created',
+        oldest_first=order != 'newest',
+    )
+    page_obj = _paginator.get_cursor_page(
+        after=request.GET.get('comments_after'))
+    return {
+        'comments': page_obj.object_list,
+        'comments_page': page_obj,
+        'comments_order': 'newest' if order == 'newest' else 'oldest',
+    }
 
 
+@condition(etag_func=conditional.index_etag)
 def index(request):
     template = 'posts/index.html'
     post_list = Post.objects.select_related('author', 'group').all()
     context = {
         'index': True,
         'page_obj': paginator(request, post_list),
+        **fragments.feed_cache(request),
     }
     return render(request, template, context)
 
 
+@condition(etag_func=conditional.group_posts_etag)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
@@ -35,9 +68,24 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    _paginator = fulltext.search_paginator(query, settings.LIMIT_ITEMS)
+    context = {
+        'query': query,
+        'page_obj': cursor_page(request, _paginator) if query else None,
+        # Ссылки паджинатора должны сохранять текст запроса
+        'pagination_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, template, context)
+
+
+@condition(etag_func=conditional.profile_etag)
 def profile(request, username):
     template = 'posts/profile.html'
-    user = get_object_or_404(User, username=username)
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
     post_list = user.posts.select_related('group').all()
     following_status = (request.user.is_authenticated
                         and Follow.objects.filter(
@@ -50,26 +98,38 @@ def profile(request, username):
         'show_follow_button': show_follow_button,
         'following_status': following_status,
         'consumer': user,
+        'stats': counters.get_stats(user),
         'page_obj': paginator(request, post_list),
     }
     return render(request, template, context)
 
 
+@condition(etag_func=conditional.post_detail_etag)
 def post_detail(request, post_id):
     form = CommentForm()
     post = get_object_or_404(
-        Post.objects.select_related('author', 'group'),
+        Post.objects.select_related('author', 'group', 'author__stats'),
         id=post_id)
-    comments = post.comments.all()
     context = {
         'form': form,
         'post': post,
-        'comments': comments,
+        'author_stats': counters.get_stats(post.author),
+        **comments_page(request, post),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def comment_list(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    context = {
+        'post': post,
+        **comments_page(request, post),
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(request.POST or None,
                     files=request.FILES or None, )
@@ -77,6 +137,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('posts:profile', username=request.user.username)
     context = {
         'form': form,
@@ -93,7 +154,9 @@ def post_edit(request, post_id):
     if post.author != request.user:
         return redirect('posts:post_detail', post_id)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -118,16 +181,17 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    post_list = Post.objects.filter(
-        author__following__user=request.user)  # не ясно
+    feed = timelines.follow_feed(request.user, settings.LIMIT_ITEMS)
     context = {
         'follow': True,
-        'page_obj': paginator(request, post_list),
+        'page_obj': cursor_page(request, feed),
+        **fragments.feed_cache(request, request.user),
     }
     return render(request, template, context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     template = 'posts/index.html'
     author = get_object_or_404(User, username=username)
@@ -138,8 +202,33 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     template = 'posts/index.html'
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return render(request, template)
+
+
+@staff_member_required
+def export_data(request, resource):
+    export = exporter.EXPORTS.get(resource)
+    if export is None:
+        raise Http404
+    output_format = request.GET.get('format', 'jsonl')
+    if output_format not in exporter.FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат.')
+    try:
+        filters = exporter.parse_filters(
+            request.GET.get('author'), request.GET.get('group'),
+            request.GET.get('since'), request.GET.get('until'))
+        export.queryset(**filters)
+    except exporter.InvalidFilter as error:
+        return HttpResponseBadRequest(str(error))
+    # Строки читаются из базы по мере отправки ответа.
+    response = StreamingHttpResponse(
+        exporter.lines(export, filters, output_format),
+        content_type=exporter.CONTENT_TYPES[output_format])
+    response['Content-Disposition'] = (
+        f'attachment; filename="{resource}.{output_format}"')
+    return response
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     # Addons
     'sorl.thumbnail',
     'debug_toolbar',
@@ -61,6 +63,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.RequestMetricsMiddleware',
 ]
 
 INTERNAL_IPS = [
@@ -143,7 +146,36 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 LIMIT_ITEMS: int = 10
+LIMIT_COMMENTS: int = 20
+PAGINATOR_COUNT_TIMEOUT: int = 60
+# Фрагменты лент сбрасываются сигналами, TTL — страховка
+FEED_CACHE_TIMEOUT: int = 300
+# Блок поста меняет ключ при правке; TTL — для имени автора и группы
+ARTICLE_CACHE_TIMEOUT: int = 60 * 60
+# Записей в лентах RSS/Atom
+FEED_ITEMS: int = 20
+TIMELINE_BATCH_SIZE: int = 1000
+TIMELINE_FANOUT_THRESHOLD: int = 10000
 LIMIT_SYMBOLS: int = 15
+# Размер страницы JSON API по умолчанию и наибольший для ?limit=
+API_PAGE_SIZE: int = 20
+API_MAX_PAGE_SIZE: int = 100
+# Ряды Prometheus по всем запросам (/metrics) и их каталог, общий
+# для процессов; чистится при запуске мастера (core.prometheus.clear)
+METRICS_EXPORT: bool = True
+METRICS_DIR = os.path.join(tempfile.gettempdir(), 'yatube-metrics')
+# /metrics доступен персоналу и по заголовку Authorization: Bearer
+# <токен>; пустой токен — только персоналу. Токен — из окружения
+METRICS_TOKEN: str = os.environ.get('METRICS_TOKEN', '')
+# Если список не пуст, /metrics доступен только с этих адресов
+METRICS_ALLOWED_IPS: list = []
+# Доля запросов, замеры которых копятся в core.metrics; 0 — не копить
+REQUEST_METRICS_SAMPLE_RATE: float = 0.1
+# Заголовок Server-Timing с замерами для персонала
+REQUEST_METRICS_STAFF: bool = True
+TEST_RUNNER = 'core.test_runner.IsolatedTestRunner'
+# База замеров benchmark_views, с которой сравниваются новые
+BENCHMARK_BASELINE = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
 POSTS_FOR_TESTING_QUANTITY: int = 12
 FIRST_PAGE_OBJ_COUNT: int = 10
 
@@ -152,8 +184,31 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+THUMBNAIL_BACKEND = 'posts.thumbnails.DeferredThumbnailBackend'
+# Процессы пула миниатюр; 0 — создавать в процессе запроса
+THUMBNAIL_WORKERS: int = 2
+# Геометрии, которые создаются сразу после загрузки картинки
+THUMBNAIL_GEOMETRIES = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+# Адаптивные варианты первой геометрии для srcset; AVIF — если Pillow умеет
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP')
+POST_IMAGE_SIZES = '(min-width: 992px) 960px, 100vw'
+# Загрузки уменьшаются до этого размера; больше этого числа пикселей
+# не декодируется (JPEG — после уменьшения при декодировании)
+POST_IMAGE_MAX_SIZE = (2048, 2048)
+POST_IMAGE_MAX_DECODED_PIXELS: int = 16_000_000
+
+# Один файл на все процессы: сброс версий лент виден всем воркерам.
+# Лежит вне исходников; тесты берут свой (core.test_runner)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(),
+                                 'yatube-cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
     }
 }